@@ -1,14 +1,11 @@
 import pygame # to create and control the game
 import sys # to handle quitting
-import random # for generating random food positions
-
-# Initialize the Pygame library to set up the game environment
-pygame.init()
+from Snake_Engine import SnakeEngine, TurnQueue # game rules that run without a window
+from Snake_Text import TextCache # to render each message only once
 
 # Set up the dimensions of the game window
 WIDTH, HEIGHT = 600, 400 # set up screen dimensions to 600 by 400 pixels
-window = pygame.display.set_mode((WIDTH, HEIGHT)) # define a window using these dimensions 
-pygame.display.set_caption('Snake')  # give it the title “Snake”
+window = None # the window, the clock and the font are created by main(), so importing this file opens nothing
 
 # Define RGB color values for various elements
 WHITE = (255, 255, 255)  # Color for text and messages
@@ -23,11 +20,36 @@ bg_color = BLACK
 # Define the size of the snake and food elements
 SNAKE_SIZE = 20
 
-# Initialize the game clock to control the frame rate
-clock = pygame.time.Clock()
+class SnakeEngineNoEdgeFood(SnakeEngine):
+    """The shared engine, except that food never appears in the top row or the left column.
+
+    The score is drawn over the top-left corner, and this game has always
+    kept food out of the first row and column.
+    """
 
-# Define the font style and size for text display
-font = pygame.font.SysFont('arial', 28)
+    def generate_food_position(self, snake_body):
+        cols, capacity = self.cols, self.cols * self.rows
+        # Inner cells are far more common than edge cells, so a few draws are usually enough
+        for _ in range(16):
+            food_pos = super().generate_food_position(snake_body)
+            if food_pos is None or (food_pos[0] and food_pos[1]):
+                return food_pos
+        inner = [cell for cell in range(cols + 1, capacity)
+                 if cell % cols and not snake_body.occupied[cell]]
+        if not inner:
+            return food_pos  # Only edge cells are left
+        cell = self.random.choice(inner)
+        return (cell % cols, cell // cols)
+
+
+# The board is WIDTH x HEIGHT pixels, i.e. 30 x 20 cells of SNAKE_SIZE
+engine = SnakeEngineNoEdgeFood(WIDTH // SNAKE_SIZE, HEIGHT // SNAKE_SIZE,
+                               start=(100 // SNAKE_SIZE, 50 // SNAKE_SIZE))
+
+# Game clock to control the frame rate, and the font style and size for text display
+clock = None
+font = None
+text_cache = TextCache()  # rendered messages, reused instead of rendering them every time
 
 def show_message(text, color, pos):
     """Display a text message on the screen at a specified position.
@@ -37,10 +59,32 @@ def show_message(text, color, pos):
         color (tuple): RGB color of the text.
         pos (tuple): (x, y) position to place the text on the screen.
     """
-    message = font.render(text, True, color)
+    message = text_cache.render(font, text, color)
     window.blit(message, pos)
     pygame.display.update()
 
+def wait_for_yes_no():
+    """Sleep until the player presses Y or N.
+    
+    pygame.event.wait() blocks until an event arrives, so the menus use
+    no CPU while they wait.
+    
+    Returns:
+        bool: True for Y, False for N.
+    """
+    while True:
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_y:
+                return True
+            elif event.key == pygame.K_n:
+                return False
+        elif event.type == pygame.WINDOWEXPOSED:
+            pygame.display.update()
+
 def game_over():
     """Handle game-over logic:
     Clears the screen, shows a “Game Over” message, and waits for the 
@@ -53,28 +97,19 @@ def game_over():
     window.fill(bg_color)
     
     # Render the "Game Over!" message and center it near the top of the screen
-    game_over_text = font.render('Game Over!', True, RED)
+    game_over_text = text_cache.render(font, 'Game Over!', RED)
     game_over_rect = game_over_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 40))
     window.blit(game_over_text, game_over_rect)
 
     # Render the "Press Y to Play Again or N to Quit" message below the game-over message
-    restart_text = font.render('Press Y to Play Again or N to Quit', True, WHITE)
+    restart_text = text_cache.render(font, 'Press Y to Play Again or N to Quit', WHITE)
     restart_rect = restart_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 20))
     window.blit(restart_text, restart_rect)
 
     pygame.display.update()
 
     # Wait for player input to determine if they want to restart or quit
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_y:
-                    return True
-                elif event.key == pygame.K_n:
-                    return False
+    return wait_for_yes_no()
 
 def start_screen():
     """Display the initial start screen with options to begin or quit the game.
@@ -88,16 +123,7 @@ def start_screen():
     show_message('Press Y to Start or N to Quit', WHITE, (100, HEIGHT // 2 - 20))
 
     # Wait for player input to either start or quit
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_y:
-                    return True
-                elif event.key == pygame.K_n:
-                    return False
+    return wait_for_yes_no()
 
 def game_loop():
     """Main game loop that controls the gameplay, snake movement, and interactions.
@@ -105,21 +131,11 @@ def game_loop():
     Returns:
         bool: False when the game ends (collision or quit).
     """
-    # Initialize snake position, body segments, direction, and speed
-    snake_pos = [100, 50]  # Initial position of the snake's head
-    snake_body = [[100, 50]]  # a list that keeps track of all the segments of the snake
-    direction = 'RIGHT'  # The snake starts by moving to the right
-    change_to = direction
+    # The engine keeps the snake, the food and the score on a grid of SNAKE_SIZE cells
+    engine.reset()  # The snake starts near the top-left corner, moving to the right
+    turns = TurnQueue(engine.direction)  # arrow keys pressed so far, used one per move
     speed = 8  # Snake's movement speed (affects game difficulty)
 
-    # Generate an initial random position for the food
-    food_pos = [random.randrange(1, (WIDTH // SNAKE_SIZE)) * SNAKE_SIZE,
-                random.randrange(1, (HEIGHT // SNAKE_SIZE)) * SNAKE_SIZE]
-    food_generate = True  # Boolean to track if food needs regenerateing, True to indicate that food is present
-
-    # Initialize score
-    score = 0
-
     # Main loop for gameplay
     while True:
         # Process player input for snake direction
@@ -127,85 +143,68 @@ def game_loop():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            elif event.type == pygame.KEYDOWN: # if an arrow key is pressed, update change_to to the new desired direction
-                # additional checking to prevent the snake from reversing directly
-                if event.key == pygame.K_UP and direction != 'DOWN':
-                    change_to = 'UP'
-                elif event.key == pygame.K_DOWN and direction != 'UP':
-                    change_to = 'DOWN'
-                elif event.key == pygame.K_LEFT and direction != 'RIGHT':
-                    change_to = 'LEFT'
-                elif event.key == pygame.K_RIGHT and direction != 'LEFT':
-                    change_to = 'RIGHT'
-
-        # Update snake direction based on user input
-        direction = change_to
-
-        # Move the snake's head in the current direction
-        if direction == 'UP': # decrease the Y-coordinate of snake_pos to move the head upward
-            snake_pos[1] -= SNAKE_SIZE
-        if direction == 'DOWN':
-            snake_pos[1] += SNAKE_SIZE
-        if direction == 'LEFT':
-            snake_pos[0] -= SNAKE_SIZE
-        if direction == 'RIGHT':
-            snake_pos[0] += SNAKE_SIZE
-
-        # Add a new segment at the head position
-        snake_body.insert(0, list(snake_pos)) # updated snake_pos is then added to the beginning of snake_body, creating a new head position
-        # Check if snake has collided with food
-        if pygame.Rect(snake_pos[0], snake_pos[1], SNAKE_SIZE, SNAKE_SIZE).colliderect(
-            pygame.Rect(food_pos[0], food_pos[1], SNAKE_SIZE, SNAKE_SIZE)):
-            food_generate = False  # Mark that food needs to regenerate
-            score += 1  # Increase score when food is eaten
-        else:
-            # If food not eaten, remove the last segment to maintain the current length
-            snake_body.pop()
-
-        # Food reappear at a new location if it was eaten
-        if not food_generate:
-            food_pos = [random.randrange(1, (WIDTH // SNAKE_SIZE)) * SNAKE_SIZE,
-                        random.randrange(1, (HEIGHT // SNAKE_SIZE)) * SNAKE_SIZE]
-        food_generate = True
+            elif event.type == pygame.KEYDOWN: # if an arrow key is pressed, queue the new desired direction
+                # quick presses are kept for the following moves; the queue drops
+                # any key that would make the snake reverse directly
+                if event.key == pygame.K_UP:
+                    turns.push('UP')
+                elif event.key == pygame.K_DOWN:
+                    turns.push('DOWN')
+                elif event.key == pygame.K_LEFT:
+                    turns.push('LEFT')
+                elif event.key == pygame.K_RIGHT:
+                    turns.push('RIGHT')
+
+        # Move the snake's head one queued turn at a time; the engine grows the snake
+        # when it eats, places new food and reports a collision with the wall or itself
+        state, reward, done = engine.step(turns.pop())
+        if done:
+            return False  # End game on collision
 
         # Fill the background color for each frame
         window.fill(bg_color)
 
-        # Draw the snake on the screen 
-        for pos in snake_body:
+        # Draw the snake on the screen (cells are converted to pixels)
+        for x, y in engine.snake_body:
             pygame.draw.rect(window, snake_color, pygame.Rect(
-                pos[0], pos[1], SNAKE_SIZE, SNAKE_SIZE))
+                x * SNAKE_SIZE, y * SNAKE_SIZE, SNAKE_SIZE, SNAKE_SIZE))
 
         # Draw the food on the screen
+        food_x, food_y = engine.food_pos
         pygame.draw.rect(window, RED, pygame.Rect(
-            food_pos[0], food_pos[1], SNAKE_SIZE, SNAKE_SIZE))
+            food_x * SNAKE_SIZE, food_y * SNAKE_SIZE, SNAKE_SIZE, SNAKE_SIZE))
 
         # Display the current score at the top-left corner
-        score_text = font.render(f'Score: {score}', True, WHITE)
+        score_text = text_cache.render(font, f'Score: {engine.score}', WHITE)
         window.blit(score_text, (10, 10))
 
-        # Check if the snake has collided with the wall or itself
-        if snake_pos[0] < 0 or snake_pos[0] >= WIDTH:
-            return False
-        if snake_pos[1] < 0 or snake_pos[1] >= HEIGHT:
-            return False  # End game if out of bounds
-        for block in snake_body[1:]:
-            if snake_pos == block:
-                return False  # End game if snake collides with itself
-
         # Update the game display with all changes
         pygame.display.update()
 
         # Control the game speed (frames per second)
         clock.tick(speed)
 
-# Main loop for the game execution flow
-while True:
-    if not start_screen():
-        break  # Exit if player chooses to quit
+def main():
+    """Set up Pygame and run the game until the player quits."""
+    global window, clock, font
+
+    # Initialize the Pygame library to set up the game environment
+    pygame.init()
+    window = pygame.display.set_mode((WIDTH, HEIGHT)) # define a window using these dimensions 
+    pygame.display.set_caption('Snake')  # give it the title “Snake”
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont('arial', 28)
+
+    # Main loop for the game execution flow
+    while True:
+        if not start_screen():
+            break  # Exit if player chooses to quit
+
+        if not game_loop():
+            if not game_over():
+                break  # Exit if player chooses to quit after game over
 
-    if not game_loop():
-        if not game_over():
-            break  # Exit if player chooses to quit after game over
+    pygame.quit()  # Quit Pygame when the game loop ends
 
-pygame.quit()  # Quit Pygame when the game loop ends
+if __name__ == "__main__":
+    main()
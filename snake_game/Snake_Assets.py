@@ -0,0 +1,108 @@
+"""Asset loading for Snake_Pro.py that does not hold up the first frame.
+
+Images are decoded and scaled on a background thread. The scaled pixels
+are also written to a cache directory, so later runs skip the decode and
+the scale entirely. Music is opened and started on a background thread
+too. Paths are resolved relative to this package, not the
+current working directory.
+"""
+import os
+import threading
+
+import pygame
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'snake_game'
+)
+
+
+def asset_path(filename):
+    """Return the full path of a file shipped next to the game."""
+    return os.path.join(ASSET_DIR, filename)
+
+
+class AssetLoader:
+    """Loads opaque images and music on background threads, with a disk cache of scaled pixels.
+
+    Usage:
+        assets = AssetLoader()
+        assets.load_music('background_music.mp3')  # Loops once it is loaded
+        assets.load_image('background_image', 'background_image.jpg', (580, 380))
+        ...
+        image = assets.take('background_image')  # None until it is ready
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.images = {}
+        self.lock = threading.Lock()
+
+    def load_image(self, name, filename, size):
+        """Start loading an image scaled to size; returns False if the file is missing."""
+        path = asset_path(filename)
+        if not os.path.exists(path):
+            print(f"Warning: {filename} not found")
+            return False
+        threading.Thread(target=self._load_image, args=(name, path, size), daemon=True).start()
+        return True
+
+    def load_music(self, filename):
+        """Start loading music and loop it once loaded; returns False if the file is missing."""
+        path = asset_path(filename)
+        if not os.path.exists(path):
+            print(f"Warning: {filename} not found")
+            return False
+        threading.Thread(target=self._play_music, args=(path,), daemon=True).start()
+        return True
+
+    def take(self, name):
+        """Return a finished image once, converted to the display format, or None."""
+        with self.lock:
+            image = self.images.pop(name, None)
+        # Conversion needs the display, so it happens here on the caller's thread
+        return image.convert() if image is not None else None
+
+    def cache_file(self, path, size):
+        """Return where the scaled pixels of an image are cached."""
+        stat = os.stat(path)
+        key = f'{os.path.basename(path)}-{stat.st_size}-{stat.st_mtime_ns}-{size[0]}x{size[1]}.rgb'
+        return os.path.join(self.cache_dir, key)
+
+    def _load_image(self, name, path, size):
+        try:
+            image = self._read_cached(path, size)
+            if image is None:
+                image = pygame.transform.scale(pygame.image.load(path), size)
+                self._write_cached(path, size, image)
+        except (pygame.error, OSError) as e:
+            print(f"Error loading assets: {e}")
+            return
+        with self.lock:
+            self.images[name] = image
+
+    def _play_music(self, path):
+        try:
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.play(-1)
+        except pygame.error as e:
+            print(f"Error loading assets: {e}")
+
+    def _read_cached(self, path, size):
+        try:
+            with open(self.cache_file(path, size), 'rb') as cached:
+                return pygame.image.frombytes(cached.read(), size, 'RGB')
+        except (OSError, ValueError):
+            return None
+
+    def _write_cached(self, path, size, image):
+        # The cache only saves time, so failing to write it is not an error
+        cache_file = self.cache_file(path, size)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(cache_file + '.tmp', 'wb') as cached:
+                cached.write(pygame.image.tobytes(image, 'RGB'))
+            os.replace(cache_file + '.tmp', cache_file)
+        except OSError:
+            pass
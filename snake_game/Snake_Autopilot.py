@@ -0,0 +1,280 @@
+"""Autopilot that plays SnakeEngine games by itself.
+
+The board is covered by a Hamiltonian cycle, and the autopilot keeps the
+snake's body in the cycle's order: going forward along the cycle from the
+head there are only free cells until the tail. Following the cycle is
+therefore always possible, so the tail can never be cut off.
+
+Each time food appears, an A* search plans a path to it that only moves
+forward in cycle order and stays clear of the tail. Such a path skips
+part of the cycle without breaking the order, so the snake reaches the
+food quickly and still keeps its tail in reach. Once the snake covers much
+of the board it follows the cycle itself, which gets to every food in
+turn and ends with a full board. A board with an odd number of cells has
+no such cycle; there the cycle leaves out a corner cell, and the snake
+usually dies a few cells short of filling the board.
+
+A plan stays valid for every tick it covers, so between food spawns a
+decision is just the next cell of the plan. Searches expand a bounded
+number of cells and every other decision is O(1), so the cost of a tick
+does not grow with the board or the snake.
+
+Run `python Snake_Autopilot.py` to see the autopilot play a number of
+headless games.
+"""
+import argparse
+import heapq
+import time
+from array import array
+from collections import deque
+
+from Snake_Engine import MOVES, STEP_DIRECTIONS, SnakeEngine
+
+MAX_EXPANSIONS = 20000  # Cells a single search may expand
+DENSE_FILL = 0.5  # Fraction of the board covered before the snake stops taking shortcuts
+SAFETY_GAP = 3  # Free cells kept between the end of a shortcut and the tail
+MAX_TICKS = 200000  # Headless games still going after this many ticks are stopped
+
+
+def hamiltonian_cycle(cols, rows):
+    """Return the packed cells of a cycle through the board, in order, or None.
+
+    Column 0 is the way back to the start and the rows zigzag over the
+    other columns. A board with an odd number of cells on both sides has
+    no Hamiltonian cycle, so there the bottom-right cell is left out and
+    the rest of the bottom row is visited in pairs from the row above.
+    """
+    if cols < 2 or rows < 2:
+        return None
+    if rows % 2 and cols % 2 == 0:
+        # Zigzag over the columns instead and transpose
+        return [(cell % rows) * cols + cell // rows for cell in hamiltonian_cycle(rows, cols)]
+    if rows % 2 and cols < 3:
+        return None
+
+    zigzag_rows = rows - rows % 2
+    order = []
+    for y in range(zigzag_rows):
+        xs = range(1, cols) if y % 2 == 0 else range(cols - 1, 0, -1)
+        for x in xs:
+            order.append(y * cols + x)
+            if rows % 2 and y == zigzag_rows - 1 and x % 2 == 1 and x < cols - 1:
+                # Detour down through the left-out row: (x, y+1), (x-1, y+1)
+                order.append((y + 1) * cols + x)
+                order.append((y + 1) * cols + x - 1)
+    # Back up column 0 to the start
+    order.extend(y * cols for y in range(zigzag_rows - 1, -1, -1))
+    return order
+
+
+class Autopilot:
+    """Chooses the turns of a SnakeEngine game.
+
+    Usage:
+        autopilot = Autopilot(engine)
+        while not engine.done:
+            engine.step(autopilot.choose())
+
+    Call reset() after engine.reset(). The cycle order is only guaranteed
+    when the autopilot has made every move since the reset.
+    """
+
+    def __init__(self, engine, max_expansions=MAX_EXPANSIONS, dense_fill=DENSE_FILL):
+        self.engine = engine
+        self.max_expansions = max_expansions
+        self.dense_fill = dense_fill
+        self.capacity = engine.cols * engine.rows
+
+        # Next cell on the cycle, and the position of every cell in cycle order
+        self.cycle_next = None
+        cycle = hamiltonian_cycle(engine.cols, engine.rows)
+        if cycle:
+            self.cycle_next = array('i', [-1]) * self.capacity
+            for cell, next_cell in zip(cycle, cycle[1:] + cycle[:1]):
+                self.cycle_next[cell] = next_cell
+            if len(cycle) < self.capacity:
+                cycle = self.add_left_out_cell(cycle)
+            self.order = array('i', cycle)
+            self.position = array('i', bytes(4 * self.capacity))
+            for position, cell in enumerate(cycle):
+                self.position[cell] = position
+
+        # Decisions by kind, for soak runs
+        self.counts = {'plan': 0, 'follow': 0, 'cycle': 0, 'shortcut': 0, 'stall': 0}
+        self.reset()
+
+    def add_left_out_cell(self, cycle):
+        """Give the cell an odd board's cycle leaves out a place in the cycle order.
+
+        It goes between the two cycle cells next to it that are two steps
+        apart, so a snake can take it as a detour: in from the first, out
+        to the second, skipping the cell in between.
+        """
+        cell = (set(range(self.capacity)) - set(cycle)).pop()
+        neighbours = list(self.neighbours(cell))
+        for before in neighbours:
+            after = self.cycle_next[self.cycle_next[before]]
+            if after in neighbours:
+                self.cycle_next[cell] = after
+                index = cycle.index(before) + 1
+                return cycle[:index] + [cell] + cycle[index:]
+        raise ValueError('left-out cell is not next to the cycle')
+
+    def reset(self):
+        """Forget the current plan."""
+        self.plan = deque()
+        self.plan_food = None
+
+    def distance(self, start, end):
+        """Number of steps forward in cycle order from start to end."""
+        return (self.position[end] - self.position[start]) % self.capacity
+
+    def choose(self):
+        """Return the turn for the next engine.step(), or None to keep going straight."""
+        engine = self.engine
+        if engine.done:
+            return None
+        cols = engine.cols
+        body = engine.snake_body
+        head = engine.snake_pos[1] * cols + engine.snake_pos[0]
+        food = engine.food_pos[1] * cols + engine.food_pos[0]
+        # The engine ignores turns back onto the snake, even a snake of length 1
+        dx, dy = MOVES[engine.direction]
+        behind = head - dy * cols - dx
+
+        # Keep following the plan for the current food, as long as the snake is where
+        # the plan expects; something else may have steered it, or restored a snapshot
+        if (self.plan and self.plan_food == food and not body.occupied[self.plan[0]]
+                and self.plan[0] != behind and self.plan[0] in self.neighbours(head)):
+            self.counts['follow'] += 1
+            return self.move(head, self.plan.popleft())
+        self.plan.clear()
+
+        if self.cycle_next is None:
+            return self.stall(head, behind)
+
+        # Shortcuts must end SAFETY_GAP cells short of the tail in cycle order
+        tail_x, tail_y = body[-1]
+        limit = (self.distance(head, tail_y * cols + tail_x) or self.capacity) - SAFETY_GAP
+        if len(body) < self.dense_fill * self.capacity and self.distance(head, food) <= limit:
+            path = self.search(head, food, self.distance(head, food), behind)
+            if path:
+                self.counts['plan'] += 1
+                self.plan = deque(path)
+                self.plan_food = food
+                return self.move(head, self.plan.popleft())
+        elif food in self.neighbours(head) and food != behind and self.skips_nothing(head, food):
+            # Food right next to the head, e.g. on the cell an odd board's cycle leaves out
+            self.counts['shortcut'] += 1
+            return self.move(head, food)
+
+        next_cell = self.cycle_next[head]
+        if next_cell != behind and not body.occupied[next_cell]:
+            self.counts['cycle'] += 1
+            return self.move(head, next_cell)
+        return self.stall(head, behind)
+
+    def skips_nothing(self, head, cell):
+        """Whether every cell between head and cell in cycle order is covered by the snake.
+
+        On a crowded board a free cell left behind the head may not come
+        back into reach before the snake runs into its tail.
+        """
+        occupied, order = self.engine.snake_body.occupied, self.order
+        start = self.position[head]
+        return all(occupied[order[(start + step) % self.capacity]]
+                   for step in range(1, self.distance(head, cell)))
+
+    def stall(self, head, behind):
+        """Move to any free neighbour; only needed when the body is out of cycle order."""
+        self.counts['stall'] += 1
+        occupied = self.engine.snake_body.occupied
+        for cell in self.neighbours(head):
+            if cell != behind and not occupied[cell]:
+                return self.move(head, cell)
+        return None
+
+    def move(self, head, cell):
+        """Return the turn that takes the head to the neighbouring cell, None if it is straight ahead."""
+        cols = self.engine.cols
+        direction = STEP_DIRECTIONS[(cell % cols - head % cols, cell // cols - head // cols)]
+        return direction if direction != self.engine.direction else None
+
+    def neighbours(self, cell):
+        cols, rows = self.engine.cols, self.engine.rows
+        x, y = cell % cols, cell // cols
+        if y > 0:
+            yield cell - cols
+        if y < rows - 1:
+            yield cell + cols
+        if x > 0:
+            yield cell - 1
+        if x < cols - 1:
+            yield cell + 1
+
+    def search(self, start, goal, limit, behind):
+        """A* from start to goal through free cells that are each further forward in
+        cycle order than the last, but at most limit steps; returns the cells after
+        start, or None if no path was found within max_expansions cells."""
+        cols = self.engine.cols
+        occupied = self.engine.snake_body.occupied
+        position, capacity = self.position, self.capacity
+        start_position = position[start]
+        goal_x, goal_y = goal % cols, goal // cols
+        came_from = {start: None, behind: start}
+        # Ties go to the deepest cell, so open ground is crossed without fanning out
+        frontier = [(abs(start % cols - goal_x) + abs(start // cols - goal_y), 0, start)]
+        expansions = 0
+        while frontier and expansions < self.max_expansions:
+            estimate, depth, cell = heapq.heappop(frontier)
+            if cell == goal:
+                path = []
+                while cell != start:
+                    path.append(cell)
+                    cell = came_from[cell]
+                return path[::-1]
+            expansions += 1
+            step = 1 - depth
+            ahead = (position[cell] - start_position) % capacity
+            for neighbour in self.neighbours(cell):
+                if neighbour in came_from or occupied[neighbour]:
+                    continue
+                if ahead < (position[neighbour] - start_position) % capacity <= limit:
+                    came_from[neighbour] = cell
+                    distance = abs(neighbour % cols - goal_x) + abs(neighbour // cols - goal_y)
+                    heapq.heappush(frontier, (step + distance, -step, neighbour))
+        return None
+
+
+def play(engine, autopilot, max_ticks=MAX_TICKS):
+    """Let the autopilot play one game to the end; returns the engine."""
+    autopilot.reset()
+    while not engine.done and engine.ticks < max_ticks:
+        engine.step(autopilot.choose())
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Let the autopilot play headless Snake games.')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--cols', type=int, default=29)
+    parser.add_argument('--rows', type=int, default=19)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    args = parser.parse_args()
+
+    engine = SnakeEngine(args.cols, args.rows)
+    autopilot = Autopilot(engine)
+    for game in range(args.games):
+        engine.reset(args.seed + game)
+        start = time.perf_counter()
+        play(engine, autopilot, args.max_ticks)
+        elapsed = time.perf_counter() - start
+        result = 'won' if engine.won else 'died' if engine.done else 'stopped'
+        print(f'seed {args.seed + game}: score {engine.score}  length {len(engine.snake_body)}  '
+              f'{result} after {engine.ticks} ticks  ({elapsed / max(engine.ticks, 1) * 1e6:.0f} us/tick)')
+    print(' '.join(f'{kind} {count}' for kind, count in autopilot.counts.items()))
+
+
+if __name__ == '__main__':
+    main()
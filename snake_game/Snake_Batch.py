@@ -0,0 +1,149 @@
+"""Many independent Snake games stepped at once with NumPy.
+
+BatchSnakeEngine follows the same rules as SnakeEngine in Snake_Engine.py,
+but keeps N boards in arrays so one step() call advances all of them with
+array operations instead of one Python loop iteration per game.
+
+Each board remembers, for every cell, the tick at which the head last
+entered it. A cell belongs to the snake while that tick is newer than
+(current tick - length), so moving the tail, growing and the self-collision
+check never have to walk the body.
+"""
+import numpy as np
+
+from Snake_Engine import (DEATH_REWARD, DIRECTION_CODES, DIRECTIONS, FOOD_REWARD, FPS, MAX_SPEED, MOVES,
+                          SnakeState)
+
+KEEP_GOING = -1  # action code that keeps the current direction
+
+# Movement table per direction code
+DX = np.array([MOVES[direction][0] for direction in DIRECTIONS], dtype=np.int32)
+DY = np.array([MOVES[direction][1] for direction in DIRECTIONS], dtype=np.int32)
+
+# Entry tick for cells the snake has never visited
+NEVER = np.iinfo(np.int32).min // 2
+
+
+class BatchSnakeEngine:
+    """N Snake games on cols x rows grids, advanced together.
+
+    Cells are packed as row * cols + column. Finished boards are reset
+    automatically at the end of step(); their final score is kept in
+    final_score until they finish again.
+
+    Usage:
+        batch = BatchSnakeEngine(1024, 29, 19, seed=1)
+        state = batch.reset()
+        state, rewards, dones = batch.step(actions)
+    """
+
+    def __init__(self, n, cols, rows, start=None, seed=None):
+        self.n = n
+        self.cols = cols
+        self.rows = rows
+        self.start = tuple(start) if start is not None else (cols // 4, rows // 2)
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.arange(n)
+
+        self.entered = np.empty((n, cols * rows), dtype=np.int32)
+        self.head_x = np.empty(n, dtype=np.int32)
+        self.head_y = np.empty(n, dtype=np.int32)
+        self.direction = np.empty(n, dtype=np.int8)
+        self.food = np.empty(n, dtype=np.int32)
+        self.length = np.empty(n, dtype=np.int32)
+        self.score = np.empty(n, dtype=np.int32)
+        self.speed = np.empty(n, dtype=np.int32)
+        self.ticks = np.empty(n, dtype=np.int32)
+        self.final_score = np.zeros(n, dtype=np.int32)
+        self.reset()
+
+    def reset(self, boards=None):
+        """Start new games on the given boards (all by default) and return the state."""
+        if boards is None:
+            boards = self.boards
+        start_x, start_y = self.start
+        self.entered[boards] = NEVER
+        self.entered[boards, start_y * self.cols + start_x] = 0
+        self.head_x[boards] = start_x
+        self.head_y[boards] = start_y
+        self.direction[boards] = DIRECTION_CODES['RIGHT']
+        self.length[boards] = 1
+        self.score[boards] = 0
+        self.speed[boards] = FPS
+        self.ticks[boards] = 0
+        self.food[boards] = self.generate_food_positions(boards)
+        return self.state()
+
+    def state(self):
+        """Return the batch state; positions are packed cell indices."""
+        head = self.head_y * self.cols + self.head_x
+        return SnakeState(head, self.direction, self.food, self.score, self.length)
+
+    def occupied(self, boards):
+        """Boolean (len(boards), cells) mask of the cells covered by each snake."""
+        oldest = self.ticks[boards] - self.length[boards]
+        return self.entered[boards] > oldest[:, None]
+
+    def snake_body(self, board):
+        """Cells of one board's snake, head first."""
+        cells = np.flatnonzero(self.occupied([board])[0])
+        return cells[np.argsort(-self.entered[board, cells])]
+
+    def generate_food_positions(self, boards):
+        """Pick a random free cell on each board, or -1 where the board is full."""
+        free = ~self.occupied(boards)
+        counts = free.sum(axis=1)
+        picks = (self.rng.random(len(counts)) * counts).astype(np.int64)
+        cells = (free.cumsum(axis=1) > picks[:, None]).argmax(axis=1).astype(np.int32)
+        cells[counts == 0] = -1
+        return cells
+
+    def step(self, actions=None):
+        """Advance every board by one tick.
+
+        Parameters:
+            actions (array-like): one direction code per board (see
+                DIRECTIONS), or KEEP_GOING. None keeps every board going
+                straight. Turning back onto the snake is ignored.
+
+        Returns:
+            tuple: (state, rewards, dones); finished boards are already reset
+            in the returned state.
+        """
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int8)
+            turn = (actions != KEEP_GOING) & (actions != (self.direction ^ 1))
+            self.direction = np.where(turn, actions, self.direction)
+
+        x = self.head_x + DX[self.direction]
+        y = self.head_y + DY[self.direction]
+        inside = (x >= 0) & (x < self.cols) & (y >= 0) & (y < self.rows)
+        cells = np.where(inside, y * self.cols + x, 0)
+
+        # Wall or body collision; the tail has not moved yet, so it still counts
+        oldest = self.ticks - self.length
+        dones = ~inside | (self.entered[self.boards, cells] > oldest)
+
+        # Move every head; boards that crashed are reset below anyway
+        self.ticks += 1
+        self.head_x = x
+        self.head_y = y
+        self.entered[self.boards, cells] = self.ticks
+
+        # Check food collision; eating keeps the tail where it is
+        eaten = ~dones & (cells == self.food)
+        rewards = np.where(dones, DEATH_REWARD, np.where(eaten, FOOD_REWARD, 0))
+        if eaten.any():
+            fed = np.flatnonzero(eaten)
+            self.length[fed] += 1
+            self.score[fed] += 1
+            self.speed[fed] = np.minimum(FPS + self.score[fed] // 5, MAX_SPEED)
+            self.food[fed] = self.generate_food_positions(fed)
+            # A snake that covers the whole board has won
+            dones |= self.food == -1
+
+        if dones.any():
+            finished = np.flatnonzero(dones)
+            self.final_score[finished] = self.score[finished]
+            self.reset(finished)
+        return self.state(), rewards, dones
@@ -0,0 +1,226 @@
+"""Headless benchmarks for the per-tick hot paths of Snake_Pro.py.
+
+Every benchmark runs at several snake lengths, from 1 up to a nearly full
+board. The snake is laid out along a back-and-forth path over the board
+and fed scripted turns that follow the path, so no keyboard is needed.
+The game state is restored between calls, so each call sees the same
+snake.
+
+Timings are per call (median and minimum over many calls) and
+allocations are the extra memory traced by tracemalloc during one call.
+Results can be written as JSON and compared with a stored baseline:
+
+    python Snake_Bench.py --out baseline.json
+    python Snake_Bench.py --baseline baseline.json
+
+The exit status is 1 when a median got slower than the baseline by more
+than the tolerance.
+"""
+import os
+
+# Benchmarks never open a real window or audio device
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+import Snake_Pro
+from Snake_Engine import MOVES
+from Snake_Replay import Replay
+
+# Fractions of the board covered by the snake, besides length 1 and a nearly full board
+FILL_LEVELS = (0.1, 0.25, 0.5, 0.75, 0.9)
+CALLS = 2000  # Timed calls per benchmark and length
+QUICK_CALLS = 200
+ALLOCATION_CALLS = 20  # Calls traced by tracemalloc
+TOLERANCE = 0.25  # Allowed slowdown against the baseline
+
+
+def board_path(cols, rows):
+    """Return every cell of the board in a back-and-forth order, row by row."""
+    path = []
+    for y in range(rows):
+        xs = range(cols) if y % 2 == 0 else range(cols - 1, -1, -1)
+        path.extend((x, y) for x in xs)
+    return path
+
+
+def snake_lengths(cells):
+    """Snake lengths to benchmark: 1, the fill levels and two cells short of full."""
+    lengths = {1, cells - 2}
+    lengths.update(max(1, int(cells * level)) for level in FILL_LEVELS)
+    return sorted(lengths)
+
+
+def direction_between(start, end):
+    for direction, (dx, dy) in MOVES.items():
+        if (start[0] + dx, start[1] + dy) == end:
+            return direction
+    raise ValueError(f'{start} and {end} are not neighbours')
+
+
+class Bench:
+    """A SnakeGame whose snake can be set to any length along the board path."""
+
+    def __init__(self):
+        self.game = Snake_Pro.SnakeGame()
+        self.engine = self.game.engine
+        self.path = board_path(self.engine.cols, self.engine.rows)
+
+        # Let the background image finish loading, so frames are measured in their steady state
+        deadline = time.perf_counter() + 5
+        while self.game.background_image is None and time.perf_counter() < deadline:
+            self.game.draw_background()
+            time.sleep(0.01)
+
+    def set_length(self, length):
+        """Lay a snake of the given length along the path, heading for the next path cell."""
+        engine = self.engine
+        engine.reset(seed=length)
+        body = engine.snake_body
+        body.clear()
+        for cell in self.path[:length]:
+            body.push_head(cell[1] * engine.cols + cell[0])
+        engine.snake_pos = self.path[length - 1]
+        if length > 1:
+            engine.direction = direction_between(self.path[length - 2], self.path[length - 1])
+        engine.food_pos = engine.generate_food_position(body)
+        self.game.replay = Replay.for_engine(engine, length)
+        self.turn = direction_between(self.path[length - 1], self.path[length])
+        self.state = engine.snapshot()
+
+    def frame(self):
+        """One tick and one full frame of game_loop, without waiting for the clock."""
+        self.game.tick(self.turn)
+        self.game.draw_frame(self.engine)
+
+    def benchmarks(self):
+        """Return name -> (function, whether the game state must be restored after each call)."""
+        game, engine = self.game, self.engine
+        return {
+            'check_collision': (lambda: engine.check_collision(self.path[len(engine.snake_body)]), False),
+            'generate_food_position': (lambda: engine.generate_food_position(engine.snake_body), False),
+            'draw_snake': (lambda: game.draw_snake(engine.snake_body), False),
+            'draw_game_info': (lambda: game.draw_game_info(engine.score, engine.speed), False),
+            'update_food_properties': (game.update_food_properties, False),
+            'game_loop_frame': (self.frame, True),
+        }
+
+    def measure(self, function, restore, calls):
+        """Time calls one by one and trace the memory allocated by a few of them."""
+        engine = self.engine
+        timer = time.perf_counter_ns
+        timings = []
+        for _ in range(calls):
+            start = timer()
+            function()
+            timings.append(timer() - start)
+            if restore:
+                engine.restore(self.state)
+
+        tracemalloc.start()
+        peaks = []
+        for _ in range(ALLOCATION_CALLS):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            if restore:
+                engine.restore(self.state)
+        tracemalloc.stop()
+
+        return {
+            'median_us': statistics.median(timings) / 1000,
+            'min_us': min(timings) / 1000,
+            'alloc_bytes': max(peaks),
+        }
+
+    def run(self, calls, only=None):
+        """Run every benchmark at every length; returns name -> length -> result."""
+        results = {}
+        lengths = snake_lengths(self.engine.cols * self.engine.rows)
+        for name, (function, restore) in self.benchmarks().items():
+            if only and name not in only:
+                continue
+            results[name] = {}
+            for length in lengths:
+                self.set_length(length)
+                function()  # Warm up caches such as gradients and sprites
+                self.engine.restore(self.state)
+                results[name][str(length)] = self.measure(function, restore, calls)
+        return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the (name, length, old, new) medians that regressed beyond tolerance."""
+    regressions = []
+    for name, by_length in results.items():
+        for length, result in by_length.items():
+            old = baseline.get('results', {}).get(name, {}).get(length)
+            if old and result['median_us'] > old['median_us'] * (1 + tolerance):
+                regressions.append((name, length, old['median_us'], result['median_us']))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    print(f'{"benchmark":<24}{"length":>8}{"median us":>12}{"min us":>10}{"alloc B":>10}{"vs base":>10}')
+    for name, by_length in results.items():
+        for length, result in by_length.items():
+            change = ''
+            old = (baseline or {}).get('results', {}).get(name, {}).get(length)
+            if old:
+                change = f'{result["median_us"] / old["median_us"] - 1:+.0%}'
+            print(f'{name:<24}{length:>8}{result["median_us"]:>12.2f}{result["min_us"]:>10.2f}'
+                  f'{result["alloc_bytes"]:>10}{change:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Snake hot paths without a display.')
+    parser.add_argument('--out', metavar='FILE', help='write the results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against results written by --out')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown of a median before it counts as a regression')
+    parser.add_argument('--quick', action='store_true', help='fewer calls per measurement')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='run only these benchmarks')
+    args = parser.parse_args()
+
+    results = Bench().run(QUICK_CALLS if args.quick else CALLS, args.only)
+    report = {
+        'meta': {
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'board': [Snake_Pro.COLS, Snake_Pro.ROWS],
+        },
+        'results': results,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if args.out:
+        with open(args.out, 'w') as out_file:
+            json.dump(report, out_file, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, length, old, new in regressions:
+            print(f'REGRESSION {name} at length {length}: {old:.2f} us -> {new:.2f} us')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Record the game window to disk without slowing the game down.
+
+The game hands every frame to FrameCapture.capture(), which only copies
+the window's raw pixels into a bounded queue. A writer thread turns them
+into RGB and writes one of three outputs, picked by the file name:
+
+    DIR            a PNG file per frame, named by frame number
+    NAME.y4m       a YUV4MPEG2 video (4:4:4), playable by ffplay and mpv
+    NAME.rgb       raw rgb24 frames, e.g. for ffmpeg -f rawvideo
+
+PNG compression (zlib), NumPy's color conversion and file writes release
+the GIL, so the writer runs alongside the game loop. When it cannot keep
+up, capture() never waits. A frame that finds the queue full is dropped
+and the capture rate is halved, down to one frame in MAX_STRIDE. It
+recovers once the queue has drained. Videos repeat the last written
+frame in place of skipped ones, so they keep the real-time frame rate.
+report() says how many frames were written, skipped and dropped.
+
+Y4M output needs NumPy; PNG and raw output only use the standard library.
+"""
+import os
+import queue
+import struct
+import threading
+import zlib
+
+CAPTURE_QUEUE = 8  # Frames waiting for the writer; about 1.3 MB each for the Snake window
+MAX_STRIDE = 8  # Capture at least one frame in this many, however far behind the writer is
+PNG_LEVEL = 3  # zlib level; higher levels compress a little better and much slower
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(rgb, width, height):
+    """Encode packed rgb24 pixels as a PNG file."""
+    stride = 3 * width
+    # Each row starts with its filter type, 0 for none
+    rows = b''.join(b'\x00' + rgb[y * stride:(y + 1) * stride] for y in range(height))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) +
+            png_chunk(b'IDAT', zlib.compress(rows, PNG_LEVEL)) + png_chunk(b'IEND', b''))
+
+
+class FrameCapture:
+    """Copies frames of a pygame surface to a writer thread that saves them to path."""
+
+    def __init__(self, path, size, fps, max_queue=CAPTURE_QUEUE):
+        self.path = path
+        self.width, self.height = size
+        self.fps = fps
+        extension = os.path.splitext(path)[1].lower()
+        self.format = {'.y4m': 'y4m', '.rgb': 'raw'}.get(extension, 'png')
+        if self.format == 'y4m':
+            import numpy  # Only needed for the color conversion of Y4M output
+            self.numpy = numpy
+        if self.format == 'png':
+            os.makedirs(path, exist_ok=True)
+            self.file = None
+        else:
+            self.file = open(path, 'wb')
+            if self.format == 'y4m':
+                self.file.write(f'YUV4MPEG2 W{self.width} H{self.height} F{fps}:1 Ip A1:1 C444\n'.encode())
+
+        self.queue = queue.Queue(max_queue)
+        self.frame = 0  # Frames offered to capture()
+        self.stride = 1  # Only every stride-th frame is captured while the writer is behind
+        self.max_stride = 1
+        self.skipped = 0
+        self.dropped = 0
+        self.written = 0
+        self.repeated = 0  # Frames a video repeats in place of skipped or dropped ones
+        self.error = None
+        self.thread = threading.Thread(target=self.write_frames, name='frame-capture', daemon=True)
+        self.thread.start()
+
+    def capture(self, surface):
+        """Queue a copy of the surface's pixels, unless the writer is behind; never blocks."""
+        frame = self.frame
+        self.frame += 1
+        if self.error is not None:
+            return
+        if frame % self.stride:
+            self.skipped += 1
+            return
+        if self.stride > 1 and self.queue.empty():
+            self.stride //= 2  # The writer caught up
+        if self.queue.full():
+            self.dropped += 1
+            self.stride = min(self.stride * 2, MAX_STRIDE)
+            self.max_stride = max(self.max_stride, self.stride)
+            return
+
+        # A copy of the raw pixels is the cheapest grab; the writer sorts out the channels
+        if surface.get_bytesize() == 4:
+            pixels = surface.get_buffer().raw
+            shifts = surface.get_shifts()[:3]
+        else:
+            import pygame
+            pixels = pygame.image.tobytes(surface, 'RGB')
+            shifts = None
+        self.queue.put_nowait((frame, pixels, surface.get_pitch(), shifts))
+
+    def rgb(self, pixels, pitch, shifts):
+        """Turn raw 32-bit pixels into packed rgb24 bytes."""
+        if shifts is None:
+            return pixels
+        width, height = self.width, self.height
+        if pitch != 4 * width:
+            pixels = b''.join(pixels[y * pitch:y * pitch + 4 * width] for y in range(height))
+        rgb = bytearray(3 * width * height)
+        for channel, shift in enumerate(shifts):
+            rgb[channel::3] = pixels[shift // 8::4]  # Little-endian: byte n holds bits 8n..8n+7
+        return rgb
+
+    def yuv(self, rgb):
+        """Convert rgb24 bytes to the three planes of a 4:4:4 Y4M frame (BT.601, limited range)."""
+        np = self.numpy
+        pixels = np.frombuffer(rgb, np.uint8).reshape(-1, 3).astype(np.float32)
+        r, g, b = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+        y = 16 + 0.257 * r + 0.504 * g + 0.098 * b
+        u = 128 - 0.148 * r - 0.291 * g + 0.439 * b
+        v = 128 + 0.439 * r - 0.368 * g - 0.071 * b
+        return np.stack((y, u, v)).round().astype(np.uint8).tobytes()
+
+    def write_frames(self):
+        last_frame, last_data = -1, None
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                frame, pixels, pitch, shifts = item
+                rgb = self.rgb(pixels, pitch, shifts)
+                if self.format == 'png':
+                    with open(os.path.join(self.path, f'frame-{frame:06d}.png'), 'wb') as png_file:
+                        png_file.write(encode_png(rgb, self.width, self.height))
+                else:
+                    data = b'FRAME\n' + self.yuv(rgb) if self.format == 'y4m' else rgb
+                    # Fill in for the frames that were not captured, to keep the video in time
+                    if last_data is not None:
+                        for _ in range(frame - last_frame - 1):
+                            self.file.write(last_data)
+                            self.repeated += 1
+                    self.file.write(data)
+                    last_frame, last_data = frame, data
+                self.written += 1
+        except Exception as error:  # Stop capturing, but never take the game down with it
+            self.error = error
+
+    def close(self):
+        """Write out the queued frames and close the output; returns report()."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.file is not None:
+            self.file.close()
+        return self.report()
+
+    def report(self):
+        text = (f'captured {self.frame} frames to {self.path}: {self.written} written, '
+                f'{self.skipped} skipped while behind (down to 1 in {self.max_stride}), '
+                f'{self.dropped} dropped with a full queue')
+        if self.repeated:
+            text += f', {self.repeated} repeated in the video in their place'
+        if self.error is not None:
+            text += f'; stopped after an error: {self.error}'
+        return text
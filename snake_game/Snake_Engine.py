@@ -0,0 +1,403 @@
+"""Headless Snake rules shared by Snake.py and Snake_Pro.py.
+
+The engine works on a grid of cells instead of pixels and never imports
+pygame, so games can be simulated without a window as fast as the CPU allows.
+Rendering code converts cells to pixels on its own.
+
+The whole state of a game lives in one bytearray: a fixed header with the
+random generator, position, direction, food, score and speed, followed by
+the SnakeBody arrays, which are memoryviews into the same buffer. A
+snapshot is therefore a single copy of that buffer, and restoring one is
+a single copy back. Snapshots can be kept in memory for rollback, written
+to disk, or restored straight from an mmap of a saved file.
+"""
+import argparse
+import random
+import struct
+from array import array
+from collections import deque, namedtuple
+
+# Game speed: base ticks per second and the cap reached as the score goes up
+FPS = 10
+MAX_SPEED = 25
+
+# Movement table: direction -> (dx, dy) in cells
+MOVES = {
+    'UP': (0, -1),
+    'DOWN': (0, 1),
+    'LEFT': (-1, 0),
+    'RIGHT': (1, 0)
+}
+
+# The snake is not allowed to turn back onto itself
+OPPOSITE = {
+    'UP': 'DOWN',
+    'DOWN': 'UP',
+    'LEFT': 'RIGHT',
+    'RIGHT': 'LEFT'
+}
+
+# Largest board side; snapshots and replays store the sides in 16 bits
+MAX_BOARD = 65535
+
+# Turns the player can queue up ahead of the snake
+MAX_QUEUED_TURNS = 3
+
+# Rewards returned by step()
+FOOD_REWARD = 1
+DEATH_REWARD = -1
+
+# Direction codes, as stored in state snapshots and replays and used by the batch
+# engine; code ^ 1 is always the opposite direction
+DIRECTIONS = tuple(MOVES)
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+# The direction of a one-cell step (dx, dy)
+STEP_DIRECTIONS = {move: direction for direction, move in MOVES.items()}
+
+# magic, version, cols, rows, random generator state (624 words and an index),
+# whether a gauss value is pending and its value, head column and row, direction,
+# food column and row (-1 without food), score, speed, ticks, done, won
+STATE_MAGIC = b'SNKS'
+STATE_VERSION = 1
+STATE_HEADER = struct.Struct('<4sHHH625I?diiBiiiiq??')
+STATE_HEADER_SIZE = -(-STATE_HEADER.size // 8) * 8  # Padded so the body's arrays stay aligned
+
+# free_count, head_slot and length of a SnakeBody
+BODY_HEADER = struct.Struct('<iii')
+
+# What step() reports back after every tick
+SnakeState = namedtuple('SnakeState', ['snake_pos', 'direction', 'food_pos', 'score', 'length'])
+
+
+def board_size(text):
+    """Parse a board size given as COLSxROWS on the command line."""
+    try:
+        cols, rows = (int(side) for side in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected COLSxROWS, got {text!r}')
+    if not (2 <= cols <= MAX_BOARD and 2 <= rows <= MAX_BOARD):
+        raise argparse.ArgumentTypeError(f'board sides must be between 2 and {MAX_BOARD}')
+    return cols, rows
+
+
+class TurnQueue:
+    """Direction changes typed by the player, handed to the engine one per tick.
+
+    Quick key presses within one tick are kept instead of overwriting each
+    other. Each turn is checked against the turn queued before it, so a
+    queued turn can never reverse the snake.
+    """
+
+    def __init__(self, direction, max_turns=MAX_QUEUED_TURNS):
+        self.turns = deque()
+        self.max_turns = max_turns
+        self.last = direction
+
+    def push(self, direction):
+        """Queue a turn; returns False if it is redundant, a reversal or the queue is full."""
+        if (len(self.turns) >= self.max_turns or
+                direction == self.last or direction == OPPOSITE[self.last]):
+            return False
+        self.turns.append(direction)
+        self.last = direction
+        return True
+
+    def pop(self):
+        """Return the next turn, or None to keep going straight."""
+        return self.turns.popleft() if self.turns else None
+
+
+class SnakeBody:
+    """Snake segments, head first, on a cols x rows grid.
+
+    Cells are packed as row * cols + column and kept in a fixed-capacity
+    ring buffer, next to an occupancy bitmap of the board. Moving the head,
+    dropping the tail and asking whether a cell is covered are all O(1) and
+    allocate nothing, however long the snake gets.
+
+    The cells not covered by the snake are kept in free[:free_count], a
+    permutation of all cells split into a free and a covered part, with
+    free_slot giving each cell's position in it. Moving a cell across the
+    split is a single swap, so a random free cell can be drawn in O(1).
+
+    All of these are memoryviews into one buffer, laid out as BODY_HEADER,
+    cells, free, free_slot, slot_of and occupied. SnakeEngine passes its
+    state buffer so the body sits right after the engine's header. Being
+    plain buffers, they can be wrapped with numpy.frombuffer() without
+    copying or knowing the layout.
+    """
+
+    def __init__(self, cols, rows, buffer=None, offset=0):
+        self.cols = cols
+        self.rows = rows
+        self.capacity = capacity = cols * rows
+        size = self.buffer_size(cols, rows)
+        self.buffer = bytearray(size) if buffer is None else buffer
+        self.view = memoryview(self.buffer)[offset:offset + size]
+        arrays = self.view[BODY_HEADER.size:BODY_HEADER.size + 16 * capacity].cast('i')
+        self.cells = arrays[:capacity]
+        self.free = arrays[capacity:2 * capacity]
+        self.free_slot = arrays[2 * capacity:3 * capacity]
+        self.slot_of = arrays[3 * capacity:]  # ring buffer slot of each covered cell
+        self.occupied_start = offset + BODY_HEADER.size + 16 * capacity
+        self.occupied = self.view[BODY_HEADER.size + 16 * capacity:]
+        self.identity = array('i', range(capacity))
+        self.occupied[:] = bytes(capacity)
+        self.free[:] = self.identity
+        self.free_slot[:] = self.identity
+        self.free_count = capacity
+        self.head_slot = 0
+        self.length = 0
+
+    @staticmethod
+    def buffer_size(cols, rows):
+        """Bytes of buffer a body on a cols x rows grid needs."""
+        return BODY_HEADER.size + 17 * cols * rows
+
+    def clear(self):
+        """Remove every segment."""
+        for cell in self.packed():
+            self.occupied[cell] = 0
+        self.length = 0
+        # Put the free cells back in their initial order, so food lands where it
+        # would on a new body and replays don't depend on earlier games
+        self.free[:] = self.identity
+        self.free_slot[:] = self.identity
+        self.free_count = self.capacity
+        self.head_slot = 0
+
+    def _swap_free(self, cell, slot):
+        """Move a cell to the given position of the free-cell permutation."""
+        other = self.free[slot]
+        old_slot = self.free_slot[cell]
+        self.free[old_slot] = other
+        self.free_slot[other] = old_slot
+        self.free[slot] = cell
+        self.free_slot[cell] = slot
+
+    def push_head(self, cell):
+        """Add a new head segment on the packed cell."""
+        self.head_slot = (self.head_slot - 1) % self.capacity
+        self.cells[self.head_slot] = cell
+        self.slot_of[cell] = self.head_slot
+        self.occupied[cell] = 1
+        self.length += 1
+        # The last free slot becomes the first covered one
+        self.free_count -= 1
+        self._swap_free(cell, self.free_count)
+
+    def pop_tail(self):
+        """Remove the last segment and return its packed cell."""
+        self.length -= 1
+        cell = self.cells[(self.head_slot + self.length) % self.capacity]
+        self.occupied[cell] = 0
+        self._swap_free(cell, self.free_count)
+        self.free_count += 1
+        return cell
+
+    def pack(self):
+        """Write the counters kept in attributes into the buffer's header."""
+        BODY_HEADER.pack_into(self.view, 0, self.free_count, self.head_slot, self.length)
+
+    def unpack(self):
+        """Read the counters back from the buffer's header after it was overwritten."""
+        self.free_count, self.head_slot, self.length = BODY_HEADER.unpack_from(self.view)
+
+    def snapshot(self):
+        """Return a copy of the body, for restore()."""
+        self.pack()
+        return bytes(self.view)
+
+    def restore(self, snapshot):
+        """Put the body back the way it was when snapshot() was taken."""
+        self.view[:] = snapshot
+        self.unpack()
+
+    def find_occupied(self, start, end):
+        """Return the first covered packed cell in start..end-1, or -1 if there is none."""
+        found = self.buffer.find(1, self.occupied_start + start, self.occupied_start + end)
+        return found - self.occupied_start if found != -1 else -1
+
+    def random_free_cell(self, rng):
+        """Return a random packed cell not covered by the snake, or None if there is none."""
+        if not self.free_count:
+            return None
+        return self.free[int(rng.random() * self.free_count)]
+
+    def index_of(self, cell):
+        """Return the position from the head of the segment on a covered packed cell."""
+        return (self.slot_of[cell] - self.head_slot) % self.capacity
+
+    def packed(self):
+        """Yield the packed cells of the snake, head first."""
+        cells, capacity = self.cells, self.capacity
+        for index in range(self.head_slot, self.head_slot + self.length):
+            yield cells[index % capacity]
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        cols = self.cols
+        for cell in self.packed():
+            yield (cell % cols, cell // cols)
+
+    def __getitem__(self, index):
+        if not -self.length <= index < self.length:
+            raise IndexError('snake body index out of range')
+        cell = self.cells[(self.head_slot + index % self.length) % self.capacity]
+        return (cell % self.cols, cell // self.cols)
+
+    def __contains__(self, pos):
+        x, y = pos
+        return 0 <= x < self.cols and 0 <= y < self.rows and self.occupied[y * self.cols + x] == 1
+
+
+class SnakeEngine:
+    """Display-free Snake game on a cols x rows grid.
+
+    Usage:
+        engine = SnakeEngine(29, 19, seed=1)
+        state = engine.reset()
+        state, reward, done = engine.step('UP')
+    """
+
+    def __init__(self, cols, rows, start=None, seed=None):
+        self.cols = cols
+        self.rows = rows
+        # The snake starts a quarter of the way in, halfway down, like Snake_Pro.py
+        self.start = tuple(start) if start is not None else (cols // 4, rows // 2)
+        self.random = random.Random(seed)
+        self.buffer = bytearray(STATE_HEADER_SIZE + SnakeBody.buffer_size(cols, rows))
+        self.snake_body = SnakeBody(cols, rows, self.buffer, STATE_HEADER_SIZE)  # head is snake_body[0]
+        self.reset()
+
+    def reset(self, seed=None):
+        """Start a new game and return its first state."""
+        if seed is not None:
+            self.random.seed(seed)
+        self.snake_pos = self.start
+        self.snake_body.clear()
+        self.snake_body.push_head(self.start[1] * self.cols + self.start[0])
+        self.direction = 'RIGHT'
+        self.score = 0
+        self.speed = FPS
+        self.ticks = 0
+        self.done = False
+        self.won = False
+        self.food_pos = self.generate_food_position(self.snake_body)
+        return self.state()
+
+    def state(self):
+        """Return a snapshot of what a player can see."""
+        return SnakeState(self.snake_pos, self.direction, self.food_pos,
+                          self.score, len(self.snake_body))
+
+    def pack(self):
+        """Write the game's attributes and random generator into the state buffer's header."""
+        version, generator, gauss = self.random.getstate()
+        food_x, food_y = self.food_pos if self.food_pos is not None else (-1, -1)
+        STATE_HEADER.pack_into(self.buffer, 0, STATE_MAGIC, STATE_VERSION, self.cols, self.rows,
+                               *generator, gauss is not None, gauss or 0.0, *self.snake_pos,
+                               DIRECTION_CODES[self.direction], food_x, food_y, self.score,
+                               self.speed, self.ticks, self.done, self.won)
+        self.snake_body.pack()
+
+    def snapshot(self):
+        """Return a copy of the whole game, including the random generator, for restore().
+
+        The copy is the state buffer as bytes, so it can also be written to a file.
+        """
+        self.pack()
+        return bytes(self.buffer)
+
+    def restore(self, snapshot):
+        """Continue from a snapshot(); the game then plays out exactly as it did from there.
+
+        Any bytes-like object holding a snapshot of a game on the same board
+        will do, such as bytes read from a file or an mmap of one.
+        """
+        fields = STATE_HEADER.unpack_from(snapshot)
+        magic, version, cols, rows = fields[:4]
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            raise ValueError('not a Snake state snapshot')
+        if (cols, rows) != (self.cols, self.rows) or len(snapshot) != len(self.buffer):
+            raise ValueError('snapshot was taken on a different board')
+        self.buffer[:] = snapshot
+        (has_gauss, gauss, snake_x, snake_y, direction, food_x, food_y,
+         self.score, self.speed, self.ticks, self.done, self.won) = fields[629:]
+        self.random.setstate((3, fields[4:629], gauss if has_gauss else None))
+        self.snake_pos = (snake_x, snake_y)
+        self.direction = DIRECTIONS[direction]
+        self.food_pos = (food_x, food_y) if food_x >= 0 else None
+        self.snake_body.unpack()
+
+    def generate_food_position(self, snake_body):
+        """Generate new food position ensuring it doesn't overlap with snake.
+
+        Returns None when the snake covers the whole board.
+        """
+        # Only free cells are sampled, so this is O(1) however full the board is
+        cell = snake_body.random_free_cell(self.random)
+        if cell is None:
+            return None
+        return (cell % self.cols, cell // self.cols)
+
+    def check_collision(self, snake_pos):
+        """Check if snake has collided with walls or itself
+
+        Returns what it ran into, 'wall' or 'self', or None without a collision.
+        """
+        x, y = snake_pos
+        # Wall collision
+        if not (0 <= x < self.cols and 0 <= y < self.rows):
+            return 'wall'
+
+        # Self collision: the head has not moved in yet, so skip the old head
+        if self.snake_body.occupied[y * self.cols + x] and snake_pos != self.snake_pos:
+            return 'self'
+
+        return None
+
+    def step(self, action=None):
+        """Advance the game by one tick.
+
+        Parameters:
+            action (str): 'UP', 'DOWN', 'LEFT' or 'RIGHT'; None keeps going
+                straight. Turning back onto the snake is ignored.
+
+        Returns:
+            tuple: (state, reward, done)
+        """
+        if self.done:
+            return self.state(), 0, True
+
+        if action is not None and action != OPPOSITE[self.direction]:
+            self.direction = action
+        dx, dy = MOVES[self.direction]
+        snake_pos = (self.snake_pos[0] + dx, self.snake_pos[1] + dy)
+        self.ticks += 1
+
+        # Check collisions
+        if self.check_collision(snake_pos):
+            self.done = True
+            return self.state(), DEATH_REWARD, True
+
+        # Update snake body
+        self.snake_pos = snake_pos
+        self.snake_body.push_head(snake_pos[1] * self.cols + snake_pos[0])
+
+        # Check food collision
+        if snake_pos == self.food_pos:
+            self.score += 1
+            self.speed = min(FPS + self.score // 5, MAX_SPEED)  # Increase speed with score
+            self.food_pos = self.generate_food_position(self.snake_body)
+            if self.food_pos is None:
+                # No room left for food: the board is full and the game is won
+                self.done = self.won = True
+                return self.state(), FOOD_REWARD, True
+            return self.state(), FOOD_REWARD, False
+
+        self.snake_body.pop_tail()
+        return self.state(), 0, False
@@ -0,0 +1,100 @@
+"""Board renderer that draws the whole snake with a few array operations.
+
+The renderer keeps a color grid with one pixel per cell between frames.
+The engine keeps its state in one buffer (see Snake_Engine.py), so its
+ring buffer of segment cells can be viewed as a NumPy array without
+copying, head first from the head slot.
+
+After one move, only the cells whose color changed are written, like
+the dirty-rect renderer of Snake_Pro.py does on screen: the vacated tail
+goes back to the background and every segment moved one step down the
+same gradient. Its truncated colors repeat along the snake, so besides
+the new head only the segments where the color steps change. The whole
+gradient is painted again when the length changes or after a full redraw.
+
+The grid is uploaded with pygame.surfarray. transform.scale then blows it
+up to the play area, and one blit of a precomputed mask rounds the
+corners of every cell like the segment sprites of Snake_Pro.py.
+"""
+import numpy as np
+import pygame
+
+
+def gradient(length, head_color, tail_color):
+    """Return the segment colors of a snake, head first, as a (length, 3) array.
+
+    Matches segment_color() in Snake_Pro.py, including the truncation to ints.
+    """
+    ratio = np.arange(length) / length
+    head = np.array(head_color, dtype=np.float64)
+    tail = np.array(tail_color, dtype=np.float64)
+    return (head * (1 - ratio[:, None]) + tail * ratio[:, None]).astype(np.uint8)
+
+
+class GridRenderer:
+    """Draws a SnakeEngine's snake as a scaled-up grid of cell colors.
+
+    Empty cells and the rounded-off corners of covered cells are filled
+    with colorkey, so blitting the result shows the background through them.
+    """
+
+    def __init__(self, engine, cell_size, head_color, tail_color, colorkey, radius=8):
+        self.engine = engine
+        self.head_color = head_color
+        self.tail_color = tail_color
+        self.colorkey = colorkey
+        cols, rows = engine.cols, engine.rows
+
+        # A zero-copy view of the engine's ring buffer of segment cells
+        self.cells = np.frombuffer(engine.snake_body.cells, np.int32)
+
+        # One color per packed cell, and the same pixels indexed [column, row] like surfarray
+        self.cell_colors = np.empty((rows * cols, 3), np.uint8)
+        self.colors = self.cell_colors.reshape(rows, cols, 3).transpose(1, 0, 2)
+        self.palette = None
+        self.steps = None  # Indexes whose color differs from the segment in front
+        self.tail = None  # Packed tail cell at the last render, None until a full one
+        self.grid = pygame.Surface((cols, rows)).convert()
+        self.scaled = pygame.Surface((cols * cell_size, rows * cell_size)).convert()
+        self.scaled.set_colorkey(colorkey)
+        self.mask = self.corner_mask(cols, rows, cell_size, radius)
+
+    def corner_mask(self, cols, rows, cell_size, radius):
+        """A surface that paints colorkey over the corners of every cell and leaves the rest alone."""
+        clear = (0, 0, 0) if self.colorkey != (0, 0, 0) else (255, 255, 255)
+        cell = pygame.Surface((cell_size, cell_size))
+        cell.fill(self.colorkey)
+        pygame.draw.rect(cell, clear, cell.get_rect(), border_radius=radius)
+        mask = pygame.Surface((cols * cell_size, rows * cell_size)).convert()
+        mask.blits([(cell, (x * cell_size, y * cell_size)) for x in range(cols) for y in range(rows)],
+                   doreturn=False)
+        mask.set_colorkey(clear)
+        return mask
+
+    def render(self, full=False):
+        """Return the play area surface with the snake drawn on it, to blit over the background.
+
+        Unless full is set, the snake has to have made exactly one move since
+        the last render; after several moves, a rewind or a new game, pass full.
+        """
+        body = self.engine.snake_body
+        length = len(body)
+        if full or self.tail is None or length != len(self.palette):
+            self.palette = gradient(length, self.head_color, self.tail_color)
+            self.steps = np.flatnonzero((self.palette[1:] != self.palette[:-1]).any(axis=1)) + 1
+            self.cell_colors[...] = self.colorkey
+            positions = np.arange(length)
+        else:
+            # The head moved on by a cell, and the tail left one unless the head took it
+            if not body.occupied[self.tail]:
+                self.cell_colors[self.tail] = self.colorkey
+            positions = np.concatenate(([0, 1], self.steps)) if length > 1 else np.zeros(1, np.intp)
+
+        cells = self.cells[(body.head_slot + positions) % body.capacity]
+        self.cell_colors[cells] = self.palette[positions]
+        self.tail = self.cells[(body.head_slot + length - 1) % body.capacity]
+
+        pygame.surfarray.blit_array(self.grid, self.colors)
+        pygame.transform.scale(self.grid, self.scaled.get_size(), self.scaled)
+        self.scaled.blit(self.mask, (0, 0))
+        return self.scaled
@@ -0,0 +1,407 @@
+"""Headless rules for several snakes on one board, used by Snake_Server.py.
+
+All snakes share one grid recording which snake covers each cell, so a
+head is checked against every body with a single lookup. Every tick all
+snakes move at once. A snake dies when its head leaves the board or runs
+into any body, tails included as in SnakeEngine, and heads that move onto
+the same cell all die.
+
+step() returns only what changed during the tick: new heads, whether the
+tail followed, deaths, new snakes and food moves. WorldView rebuilds the
+whole board from a keyframe() and those changes, so a client can mirror
+the game without ever receiving whole bodies again.
+
+Food is also filed in a coarse spatial hash of FOOD_BUCKET x FOOD_BUCKET
+blocks, so ArenaPilot can find the food near a head by looking at a few
+blocks around it instead of at every food on the board. A tick of an
+arena with hundreds of snakes costs the same per snake however long the
+snakes are. Run `python Snake_Multi.py` to measure it headless.
+"""
+import argparse
+import random
+import time
+from array import array
+from collections import deque
+
+from Snake_Engine import MOVES, OPPOSITE, STEP_DIRECTIONS, TurnQueue
+
+START_LENGTH = 3
+FOOD_PER_SNAKE = 1  # Food kept on the board for each snake, and at least one
+ARENA_RESPAWN_TICKS = 10  # Ticks before a crashed arena snake comes back
+SPAWN_ATTEMPTS = 100  # Random places tried before giving up on adding a snake
+FOOD_BUCKET = 8  # Side in cells of the blocks food is filed under
+
+
+class Snake:
+    """One snake of a MultiSnakeEngine; cells are packed, head first."""
+
+    __slots__ = ('id', 'cells', 'direction', 'turns', 'score', 'target')
+
+    def __init__(self, snake_id, cells, direction):
+        self.id = snake_id
+        self.cells = deque(cells)
+        self.direction = direction
+        self.turns = TurnQueue(direction)
+        self.score = 0
+        self.target = None  # Food an ArenaPilot is steering the snake to
+
+
+class MultiSnakeEngine:
+    """Display-free Snake game for several snakes on a cols x rows grid.
+
+    Snake ids are positive integers chosen by the caller; the grid holds
+    the id of the snake covering each cell and 0 for free cells.
+    """
+
+    def __init__(self, cols, rows, seed=None):
+        self.cols = cols
+        self.rows = rows
+        self.random = random.Random(seed)
+        self.grid = array('H', bytes(2 * cols * rows))
+        self.snakes = {}
+        self.food = set()
+        self.bucket_cols = -(-cols // FOOD_BUCKET)
+        self.food_buckets = [set() for _ in range(self.bucket_cols * -(-rows // FOOD_BUCKET))]
+        self.ticks = 0
+        self.spawned = []  # Snakes added since the last step()
+        self.left = []  # Ids of the snakes removed since the last step()
+        self.food_changes = []  # (old, new) food cells since the last step()
+
+    def add_snake(self, snake_id):
+        """Place a new snake on a random free stretch of the board; returns it,
+        or None if no room was found."""
+        cols, rows = self.cols, self.rows
+        for _ in range(SPAWN_ATTEMPTS):
+            direction = self.random.choice(list(MOVES))
+            dx, dy = MOVES[direction]
+            x, y = self.random.randrange(cols), self.random.randrange(rows)
+            # The body trails behind the head, and the cells ahead must be free too
+            stretch = [(x - dx * step, y - dy * step) for step in range(-START_LENGTH, START_LENGTH)]
+            if all(0 <= cx < cols and 0 <= cy < rows and not self.grid[cy * cols + cx]
+                   and cy * cols + cx not in self.food for cx, cy in stretch):
+                cells = [cy * cols + cx for cx, cy in stretch[START_LENGTH:]]
+                snake = Snake(snake_id, cells, direction)
+                for cell in cells:
+                    self.grid[cell] = snake_id
+                self.snakes[snake_id] = snake
+                self.spawned.append(snake)
+                self.place_food()
+                return snake
+        return None
+
+    def remove_snake(self, snake_id):
+        """Take a snake off the board, e.g. when its player leaves."""
+        snake = self.snakes.pop(snake_id, None)
+        if snake is not None:
+            for cell in snake.cells:
+                self.grid[cell] = 0
+            if snake in self.spawned:
+                self.spawned.remove(snake)
+            else:
+                self.left.append(snake_id)
+
+    def turn(self, snake_id, direction):
+        """Queue a turn for a snake's next ticks; reversals are dropped."""
+        snake = self.snakes.get(snake_id)
+        if snake is not None and direction in MOVES:
+            snake.turns.push(direction)
+
+    def random_free_cell(self):
+        """Return a random packed cell with no snake or food on it, or None if there is none."""
+        grid, food, capacity = self.grid, self.food, self.cols * self.rows
+        for _ in range(SPAWN_ATTEMPTS):
+            cell = self.random.randrange(capacity)
+            if not grid[cell] and cell not in food:
+                return cell
+        # Crowded board: pick among the free cells that are left
+        free = [cell for cell in range(capacity) if not grid[cell] and cell not in food]
+        return self.random.choice(free) if free else None
+
+    def food_bucket(self, cell):
+        """Return the set of food in the spatial hash block of a packed cell."""
+        cols = self.cols
+        return self.food_buckets[cell // cols // FOOD_BUCKET * self.bucket_cols + cell % cols // FOOD_BUCKET]
+
+    def place_food(self):
+        """Add food until there is enough for the snakes."""
+        wanted = max(1, len(self.snakes) * FOOD_PER_SNAKE)
+        while len(self.food) < wanted:
+            cell = self.random_free_cell()
+            if cell is None:
+                break
+            self.food.add(cell)
+            self.food_bucket(cell).add(cell)
+            self.food_changes.append((None, cell))
+
+    def nearest_food(self, cell):
+        """Return the food closest to a packed cell, or None if there is none.
+
+        Rings of hash blocks are searched outwards from the cell's block. A
+        food found in ring r is at least (r - 1) * FOOD_BUCKET cells away, so
+        the search can stop one ring after the first food turns up.
+        """
+        if not self.food:
+            return None
+        cols = self.cols
+        x, y = cell % cols, cell // cols
+        bucket_x, bucket_y = x // FOOD_BUCKET, y // FOOD_BUCKET
+        bucket_cols, bucket_rows = self.bucket_cols, len(self.food_buckets) // self.bucket_cols
+        buckets = self.food_buckets
+        best = best_distance = None
+        for ring in range(max(bucket_cols, bucket_rows)):
+            if best is not None and (ring - 1) * FOOD_BUCKET >= best_distance:
+                break
+            for by in range(max(0, bucket_y - ring), min(bucket_rows, bucket_y + ring + 1)):
+                if by in (bucket_y - ring, bucket_y + ring):
+                    row = range(max(0, bucket_x - ring), min(bucket_cols, bucket_x + ring + 1))
+                else:
+                    # Only the ends of the row are on the ring, the middle was searched already
+                    row = [bx for bx in (bucket_x - ring, bucket_x + ring) if 0 <= bx < bucket_cols]
+                for bx in row:
+                    for food in buckets[by * bucket_cols + bx]:
+                        distance = abs(food % cols - x) + abs(food // cols - y)
+                        if best is None or distance < best_distance:
+                            best, best_distance = food, distance
+        return best
+
+    def step(self):
+        """Move every snake one cell and return the changes as a dict:
+
+            left     [id] for snakes removed since the last step
+            spawned  [(id, cells, direction)] for snakes added since the last step
+            moves    [(id, new head, grew)] for the snakes that moved
+            died     [id] for the snakes that crashed, already off the board
+            food     [(old cell or None, new cell or None)]
+            scores   [(id, score)] for the snakes that ate
+        """
+        cols, rows, grid = self.cols, self.rows, self.grid
+        self.ticks += 1
+        changes = {
+            'tick': self.ticks,
+            'left': self.left,
+            'spawned': [(snake.id, list(snake.cells), snake.direction) for snake in self.spawned],
+            'moves': [],
+            'died': [],
+            'food': self.food_changes,
+            'scores': [],
+        }
+        self.spawned = []
+        self.left = []
+        self.food_changes = []
+
+        # Work out every new head against the board as it was at the start of the tick
+        heads = {}
+        dead = []
+        for snake in self.snakes.values():
+            turn = snake.turns.pop()
+            if turn is not None and turn != OPPOSITE[snake.direction]:
+                snake.direction = turn
+            dx, dy = MOVES[snake.direction]
+            head = snake.cells[0]
+            x, y = head % cols + dx, head // cols + dy
+            if not (0 <= x < cols and 0 <= y < rows) or grid[y * cols + x]:
+                dead.append(snake)
+            else:
+                heads.setdefault(y * cols + x, []).append(snake)
+
+        for cell, movers in heads.items():
+            if len(movers) > 1:
+                dead.extend(movers)  # Head-on collision
+                continue
+            snake = movers[0]
+            snake.cells.appendleft(cell)
+            grid[cell] = snake.id
+            grew = cell in self.food
+            if grew:
+                self.food.discard(cell)
+                self.food_bucket(cell).discard(cell)
+                changes['food'].append((cell, None))
+                snake.score += 1
+                changes['scores'].append((snake.id, snake.score))
+            else:
+                grid[snake.cells.pop()] = 0
+            changes['moves'].append((snake.id, cell, grew))
+
+        for snake in dead:
+            del self.snakes[snake.id]
+            for cell in snake.cells:
+                grid[cell] = 0
+            changes['died'].append(snake.id)
+
+        self.food_changes = changes['food']
+        self.place_food()
+        self.food_changes = []
+        return changes
+
+    def keyframe(self):
+        """Return the whole board, for a WorldView to start from."""
+        return {
+            'tick': self.ticks,
+            'snakes': [(snake.id, list(snake.cells), snake.direction, snake.score)
+                       for snake in self.snakes.values()],
+            'food': sorted(self.food),
+        }
+
+
+class WorldView:
+    """A copy of a MultiSnakeEngine board, kept up to date from keyframes and step() changes."""
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.occupied = bytearray(cols * rows)
+        self.snakes = {}  # id -> deque of packed cells, head first
+        self.directions = {}
+        self.scores = {}
+        self.food = set()
+        self.tick = 0
+
+    def add(self, snake_id, cells, direction, score=0):
+        self.remove(snake_id)
+        self.snakes[snake_id] = deque(cells)
+        self.directions[snake_id] = direction
+        self.scores[snake_id] = score
+        for cell in cells:
+            self.occupied[cell] = 1
+
+    def remove(self, snake_id):
+        cells = self.snakes.pop(snake_id, None)
+        if cells is not None:
+            for cell in cells:
+                self.occupied[cell] = 0
+            del self.directions[snake_id]
+            del self.scores[snake_id]
+
+    def load_keyframe(self, keyframe):
+        for snake_id in list(self.snakes):
+            self.remove(snake_id)
+        for snake_id, cells, direction, score in keyframe['snakes']:
+            self.add(snake_id, cells, direction, score)
+        self.food = set(keyframe['food'])
+        self.tick = keyframe['tick']
+
+    def apply(self, changes):
+        """Apply the changes of one step(), in the order the engine made them."""
+        cols = self.cols
+        for snake_id in changes['left']:
+            self.remove(snake_id)
+        for snake_id, cells, direction in changes['spawned']:
+            self.add(snake_id, cells, direction)
+        for snake_id, head, grew in changes['moves']:
+            cells = self.snakes[snake_id]
+            old_head = cells[0]
+            self.directions[snake_id] = STEP_DIRECTIONS[(head % cols - old_head % cols,
+                                                         head // cols - old_head // cols)]
+            cells.appendleft(head)
+            self.occupied[head] = 1
+            if not grew:
+                self.occupied[cells.pop()] = 0
+        for snake_id in changes['died']:
+            self.remove(snake_id)
+        for old, new in changes['food']:
+            self.food.discard(old)
+            if new is not None:
+                self.food.add(new)
+        for snake_id, score in changes['scores']:
+            self.scores[snake_id] = score
+        self.tick = changes['tick']
+
+    def cell_pos(self, cell):
+        return (cell % self.cols, cell // self.cols)
+
+
+class ArenaPilot:
+    """Steers every snake of a MultiSnakeEngine towards the food nearest to it.
+
+    A snake keeps its target until someone eats it, so the spatial hash is
+    only searched when food disappears. Each tick a snake looks at its three
+    next cells in the shared grid and avoids walls, bodies and dead ends.
+    """
+
+    def __init__(self, engine, seed=None):
+        self.engine = engine
+        self.random = random.Random(seed)
+
+    def steer(self):
+        """Queue the next turn of every snake."""
+        engine = self.engine
+        cols, rows, grid, food = engine.cols, engine.rows, engine.grid, engine.food
+        for snake in engine.snakes.values():
+            head = snake.cells[0]
+            if snake.target not in food:
+                snake.target = engine.nearest_food(head)
+            target = snake.target if snake.target is not None else head
+            target_x, target_y = target % cols, target // cols
+            x, y = head % cols, head // cols
+
+            best = None
+            for direction, (dx, dy) in MOVES.items():
+                nx, ny = x + dx, y + dy
+                if direction == OPPOSITE[snake.direction] or not (0 <= nx < cols and 0 <= ny < rows):
+                    continue
+                cell = ny * cols + nx
+                if grid[cell]:
+                    continue
+                exits = sum(1 for ex, ey in ((nx, ny - 1), (nx, ny + 1), (nx - 1, ny), (nx + 1, ny))
+                            if 0 <= ex < cols and 0 <= ey < rows and not grid[ey * cols + ex])
+                score = (exits <= 1, abs(nx - target_x) + abs(ny - target_y), self.random.random())
+                if best is None or score < best[0]:
+                    best = (score, direction)
+            if best is not None and best[1] != snake.direction:
+                snake.turns.push(best[1])
+
+
+class Arena:
+    """A MultiSnakeEngine full of ArenaPilot snakes that come back after they crash."""
+
+    def __init__(self, cols, rows, snakes, seed=None, respawn_ticks=ARENA_RESPAWN_TICKS):
+        self.engine = MultiSnakeEngine(cols, rows, seed)
+        self.pilot = ArenaPilot(self.engine, seed)
+        self.respawn_ticks = respawn_ticks
+        self.respawns = deque()  # (tick, snake id) of crashed snakes, oldest first
+        for snake_id in range(1, snakes + 1):
+            if self.engine.add_snake(snake_id) is None:
+                self.respawns.append((0, snake_id))
+
+    def step(self):
+        """Bring back the snakes that are due, steer and step; returns the step() changes."""
+        engine = self.engine
+        for _ in range(len(self.respawns)):
+            if self.respawns[0][0] > engine.ticks:
+                break
+            tick, snake_id = self.respawns.popleft()
+            if engine.add_snake(snake_id) is None:
+                self.respawns.append((engine.ticks + 1, snake_id))  # No room yet
+        self.pilot.steer()
+        changes = engine.step()
+        for snake_id in changes['died']:
+            self.respawns.append((engine.ticks + self.respawn_ticks, snake_id))
+        return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time headless arenas of AI snakes.')
+    parser.add_argument('--snakes', type=int, nargs='+', default=[50, 100, 200, 400])
+    parser.add_argument('--cols', type=int, default=116)
+    parser.add_argument('--rows', type=int, default=76)
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'{"snakes":>7}{"us/tick":>10}{"us/snake":>10}{"mean length":>13}{"deaths/tick":>13}')
+    for snakes in args.snakes:
+        arena = Arena(args.cols, args.rows, snakes, args.seed)
+        deaths = 0
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            deaths += len(arena.step()['died'])
+        elapsed = time.perf_counter() - start
+        alive = arena.engine.snakes.values()
+        mean_length = sum(len(snake.cells) for snake in alive) / max(len(alive), 1)
+        tick_us = elapsed / args.ticks * 1e6
+        print(f'{snakes:>7}{tick_us:>10.0f}{tick_us / snakes:>10.2f}{mean_length:>13.1f}'
+              f'{deaths / args.ticks:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Observation encoders for policies that play Snake, computed for many games at once.
+
+ObservationEncoder turns the occupancy, head and food of n games into
+three feature arrays, all of them allocated once and overwritten by every
+encode():
+
+    grid         (n, 4, rows + 2, cols + 2) float32 planes: body, head,
+                 food and walls; the board is padded by one cell of wall
+    rays         (n, 8, 3) float32: 1 / distance to the wall, the body and
+                 the food looking from the head in the 8 directions of
+                 RAY_DIRECTIONS, 0 when nothing is seen that way
+    food_vector  (n, 2) float32: food column and row minus the head's,
+                 divided by cols and rows; 0 without food
+
+Everything is done with array operations over the whole batch, so the
+cost of encode() grows with the number of games and the board size but
+not with the length of the snakes. The cells each ray passes only depend
+on the head, so on boards up to RAY_TABLE_LIMIT they are looked up in
+tables computed once per encoder instead of being worked out every time.
+The games can come from a BatchSnakeEngine or from a list of SnakeEngines,
+whose occupancy bitmaps are read straight from their state buffers.
+
+Run `python Snake_Observe.py` to time the encoders against the engines.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from Snake_Batch import BatchSnakeEngine
+from Snake_Engine import SnakeEngine
+
+# Ray directions as (dx, dy): the 4 moves first, then the diagonals
+RAY_DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1))
+RAY_DX = np.array([dx for dx, dy in RAY_DIRECTIONS], dtype=np.int32)
+RAY_DY = np.array([dy for dx, dy in RAY_DIRECTIONS], dtype=np.int32)
+
+# Largest number of table entries (cells x 8 rays x steps) precomputed for the rays
+RAY_TABLE_LIMIT = 1 << 22
+
+# Planes of ObservationEncoder.grid
+BODY, HEAD, FOOD, WALLS = range(4)
+# Columns of ObservationEncoder.rays
+RAY_WALL, RAY_BODY, RAY_FOOD = range(3)
+
+
+class ObservationEncoder:
+    """Encodes n games on cols x rows boards into preallocated feature arrays.
+
+    Usage:
+        encoder = ObservationEncoder(batch.n, batch.cols, batch.rows)
+        encoder.encode_batch(batch)
+        policy(encoder.grid, encoder.rays, encoder.food_vector)
+    """
+
+    def __init__(self, n, cols, rows):
+        self.n = n
+        self.cols = cols
+        self.rows = rows
+        self.games = np.arange(n)
+
+        self.grid = np.zeros((n, 4, rows + 2, cols + 2), dtype=np.float32)
+        self.grid[:, WALLS] = 1
+        self.grid[:, WALLS, 1:-1, 1:-1] = 0
+        self.rays = np.zeros((n, 8, 3), dtype=np.float32)
+        self.food_vector = np.zeros((n, 2), dtype=np.float32)
+
+        # Head and food cells set by the last encode(), to clear them in the next
+        self.marked = np.zeros(0, dtype=np.intp)
+
+        # Scratch space for the rays: every cell up to `reach` steps from the head,
+        # which is far enough for every ray to leave the board
+        self.reach = reach = max(cols, rows)
+        steps = np.arange(1, reach + 1, dtype=np.int32)
+        self.step_dx = RAY_DX[:, None] * steps  # (8, reach)
+        self.step_dy = RAY_DY[:, None] * steps
+        self.inverse_steps = (1 / steps).astype(np.float32)
+        self.ray_cells = np.empty((n, 8, reach), dtype=np.intp)  # cells of all games in one flat index
+        self.ray_values = np.empty((n, 8, reach), dtype=np.uint8)
+        self.inside = np.empty((n, 8, reach), dtype=bool)
+        self.hits = np.empty((n, 8, reach), dtype=bool)
+        self.game_offsets = (self.games * cols * rows)[:, None, None]
+
+        # The rays from every possible head, when the tables are small enough
+        self.ray_table = None
+        capacity = cols * rows
+        if capacity * 8 * reach <= RAY_TABLE_LIMIT:
+            every_cell = np.arange(capacity)
+            self.ray_table = np.empty((capacity, 8, reach), dtype=np.intp)
+            self.inside_table = np.empty((capacity, 8, reach), dtype=bool)
+            self.trace_rays(every_cell % cols, every_cell // cols, self.ray_table, self.inside_table)
+            self.wall_table = self.inverse_steps[(~self.inside_table).argmax(axis=2)]
+
+        # Occupancy of SnakeEngine games, copied from their state buffers
+        self.engine_occupied = np.zeros((n, cols * rows), dtype=np.uint8)
+        self.engine_heads = np.zeros(n, dtype=np.int32)
+        self.engine_food = np.zeros(n, dtype=np.int32)
+        self.engine_views = [(None, None)] * n  # (state buffer, occupancy view) of each game's engine
+
+    def encode(self, occupied, head, food):
+        """Fill grid, rays and food_vector.
+
+        occupied is an (n, cols * rows) array that is nonzero on the cells of
+        each snake; head and food are packed cells, food -1 where there is none.
+        """
+        cols, rows, games = self.cols, self.rows, self.games
+        if occupied.dtype == bool:
+            occupied = occupied.view(np.uint8)
+        occupied = occupied.reshape(self.n, rows, cols)
+        head_x, head_y = head % cols, head // cols
+        has_food = food >= 0
+        food_x, food_y = food % cols, food // cols
+
+        # Grid planes; walls never change, and the head and food planes only
+        # need the cells marked last time cleared
+        grid = self.grid
+        grid[:, BODY, 1:-1, 1:-1] = occupied
+        planes = grid.reshape(-1)
+        planes[self.marked] = 0
+        head_marks = np.ravel_multi_index((games, HEAD, head_y + 1, head_x + 1), grid.shape)
+        fed = games[has_food]
+        food_marks = np.ravel_multi_index((fed, FOOD, food_y[has_food] + 1, food_x[has_food] + 1), grid.shape)
+        self.marked = np.concatenate((head_marks, food_marks))
+        planes[self.marked] = 1
+
+        # Relative food position
+        self.food_vector[:, 0] = np.where(has_food, (food_x - head_x) / cols, 0)
+        self.food_vector[:, 1] = np.where(has_food, (food_y - head_y) / rows, 0)
+
+        # Every cell along the 8 rays, and the wall where each ray leaves the board
+        cells, inside, hits = self.ray_cells, self.inside, self.hits
+        if self.ray_table is not None:
+            np.take(self.ray_table, head, axis=0, out=cells)
+            np.take(self.inside_table, head, axis=0, out=inside)
+            self.rays[:, :, RAY_WALL] = self.wall_table[head]
+        else:
+            self.trace_rays(head_x, head_y, cells, inside)
+            np.logical_not(inside, out=hits)
+            self.rays[:, :, RAY_WALL] = self.inverse_steps[hits.argmax(axis=2)]
+        cells += self.game_offsets
+
+        np.take(occupied.reshape(-1), cells, out=self.ray_values)
+        np.not_equal(self.ray_values, 0, out=hits)
+        self.first_hit(RAY_BODY)
+        np.equal(cells, (food + self.game_offsets[:, 0, 0])[:, None, None], out=hits)
+        hits &= has_food[:, None, None]
+        self.first_hit(RAY_FOOD)
+        return self
+
+    def trace_rays(self, head_x, head_y, cells, inside):
+        """Write the packed cells along the rays from each head into cells, clipped
+        onto the board where a ray has left it, and whether they are on it into inside."""
+        cols, rows = self.cols, self.rows
+        ray_x = np.add(head_x[:, None, None], self.step_dx)
+        ray_y = np.add(head_y[:, None, None], self.step_dy)
+        np.greater_equal(ray_x, 0, out=inside)
+        inside &= ray_x < cols
+        inside &= ray_y >= 0
+        inside &= ray_y < rows
+        np.clip(ray_x, 0, cols - 1, out=ray_x)
+        np.clip(ray_y, 0, rows - 1, out=ray_y)
+        np.multiply(ray_y, cols, out=cells)
+        cells += ray_x
+
+    def first_hit(self, column):
+        """Store 1 / steps to the first of self.hits inside the board along each ray,
+        or 0 if there is none, in rays[..., column]."""
+        hits = self.hits
+        hits &= self.inside
+        first = hits.argmax(axis=2)
+        seen = np.take_along_axis(hits, first[:, :, None], axis=2)[:, :, 0]
+        self.rays[:, :, column] = np.where(seen, self.inverse_steps[first], 0)
+
+    def encode_batch(self, batch):
+        """Encode the boards of a BatchSnakeEngine."""
+        head = batch.head_y * batch.cols + batch.head_x
+        return self.encode(batch.occupied(batch.boards), head, batch.food)
+
+    def encode_engines(self, engines):
+        """Encode a list of n SnakeEngine games on the encoder's board size."""
+        occupied, heads, food = self.engine_occupied, self.engine_heads, self.engine_food
+        cols = self.cols
+        views = self.engine_views
+        for game, engine in enumerate(engines):
+            buffer, view = views[game]
+            if buffer is not engine.buffer:
+                # A different engine in this slot than last time
+                view = np.frombuffer(engine.snake_body.occupied, np.uint8)
+                views[game] = (engine.buffer, view)
+            occupied[game] = view
+            heads[game] = engine.snake_pos[1] * cols + engine.snake_pos[0]
+            food[game] = engine.food_pos[1] * cols + engine.food_pos[0] if engine.food_pos else -1
+        return self.encode(occupied, heads, food)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the observation encoders.')
+    parser.add_argument('--games', type=int, nargs='+', default=[1, 64, 1024])
+    parser.add_argument('--cols', type=int, default=29)
+    parser.add_argument('--rows', type=int, default=19)
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'{"games":>7}{"batch step us":>15}{"encode us":>11}{"per game us":>13}'
+          f'{"engines encode us":>19}{"per game us":>13}')
+    for n in args.games:
+        batch = BatchSnakeEngine(n, args.cols, args.rows, seed=n)
+        encoder = ObservationEncoder(n, args.cols, args.rows)
+        rng = np.random.default_rng(n)
+        step_time = encode_time = 0.0
+        for _ in range(args.ticks):
+            start = time.perf_counter()
+            batch.step(rng.integers(0, 4, n))
+            middle = time.perf_counter()
+            encoder.encode_batch(batch)
+            step_time += middle - start
+            encode_time += time.perf_counter() - middle
+
+        engines = [SnakeEngine(args.cols, args.rows, seed=game) for game in range(n)]
+        engine_time = 0.0
+        for _ in range(args.ticks):
+            for engine in engines:
+                if engine.done:
+                    engine.reset()
+                engine.step(None if rng.random() < 0.8 else ('UP', 'DOWN', 'LEFT', 'RIGHT')[rng.integers(4)])
+            start = time.perf_counter()
+            encoder.encode_engines(engines)
+            engine_time += time.perf_counter() - start
+
+        ticks = args.ticks
+        print(f'{n:>7}{step_time / ticks * 1e6:>15.0f}{encode_time / ticks * 1e6:>11.0f}'
+              f'{encode_time / ticks / n * 1e6:>13.2f}{engine_time / ticks * 1e6:>19.0f}'
+              f'{engine_time / ticks / n * 1e6:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,20 @@
 import pygame
 import sys
-import random
 import os
-
-# Initialize Pygame
-pygame.init()
+import time
+import random
+import argparse
+import struct
+from array import array
+from Snake_Assets import AssetLoader
+from Snake_Autopilot import Autopilot
+from Snake_Capture import FrameCapture
+from Snake_Engine import SnakeEngine, TurnQueue, board_size
+from Snake_Multi import Arena, WorldView
+from Snake_Profiler import FrameProfiler
+from Snake_Replay import Replay
+from Snake_Server import Connection
+from Snake_Text import TextCache
 
 # Game area dimensions (inside border)
 GAME_WIDTH, GAME_HEIGHT = 600, 400
@@ -18,9 +28,8 @@ BOTTOM_MARGIN = 50  # Space at bottom
 WIDTH = GAME_WIDTH + (2 * SIDE_MARGIN)  # Add margins to sides
 HEIGHT = GAME_HEIGHT + TOP_MARGIN + BOTTOM_MARGIN  # Add top and bottom margins
 
-# Create window with extra space for text
-window = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('Snake')
+# Window with extra space for text, created by init_display() when a game starts
+window = None
 
 # Define colors (RGB format)
 WHITE = (255, 255, 255)
@@ -30,22 +39,329 @@ BLACK = (0, 0, 0)
 GRAY = (50, 50, 50)
 ORANGE = (255, 165, 0)
 BLUE = (31, 64, 237)
+OTHER_SNAKE_COLOR = (170, 120, 40)  # Other players' snakes in network games
 
 # Game constants
 SNAKE_SIZE = 20
 BORDER_THICKNESS = 10
-FPS = 10  # Base game speed
+RENDER_FPS = 60  # Frames drawn per second, independent of the snake's speed
+MAX_FRAME_TIME = 0.25  # Longest pause the simulation catches up on at once
+
+# Snake gradient, from head to tail
+SNAKE_HEAD_COLOR = (31, 64, 238)
+SNAKE_TAIL_COLOR = (0, 128, 128)
+SPRITE_COLORKEY = (255, 0, 255)  # Transparent corners of the rounded segment sprites
+PALETTE_CACHE_SIZE = 8  # Gradients kept for recent snake lengths
+
+# Frame-time graph of the profiler, in the bottom margin right of the controls line
+PROFILER_GRAPH = pygame.Rect(WIDTH - SIDE_MARGIN - 150, HEIGHT - 45, 150, 40)
+PROFILER_AREA = pygame.Rect(WIDTH // 2, HEIGHT - BOTTOM_MARGIN, WIDTH // 2, BOTTOM_MARGIN)
+
+# Play area in cells, as seen by the headless engine
+COLS = (GAME_WIDTH - 2*BORDER_THICKNESS) // SNAKE_SIZE
+ROWS = (GAME_HEIGHT - 2*BORDER_THICKNESS) // SNAKE_SIZE
+START_CELL = ((GAME_WIDTH//4 - BORDER_THICKNESS) // SNAKE_SIZE,
+              (GAME_HEIGHT//2 - BORDER_THICKNESS) // SNAKE_SIZE)
+
+# Minimap of boards larger than the play area, in its top-right corner
+MINIMAP_SIZE = 120  # Longest side in pixels
+MINIMAP_MARGIN = 6
+MINIMAP_BACKGROUND = (20, 20, 20)
+
+# Arena of AI snakes, drawn as one small picture scaled up to the play area
+ARENA_CELL_SIZE = 5  # Pixels per cell on the default arena board
+ARENA_BOARD = ((GAME_WIDTH - 2*BORDER_THICKNESS) // ARENA_CELL_SIZE,
+               (GAME_HEIGHT - 2*BORDER_THICKNESS) // ARENA_CELL_SIZE)
+ARENA_TICK_RATE = 15  # Ticks per second
+ARENA_COLORS = 24  # Distinct snake colors, picked by snake id
+
+# Saved games: the engine's state buffer, the replay so far and the food animation
+SAVE_MAGIC = b'SNKG'
+SAVE_VERSION = 1
+SAVE_FILE = 'snake-save.bin'  # Written by the pause menu unless --save names another file
+# magic, version, state bytes, replay bytes, food green, color direction, food size, size direction
+SAVE_HEADER = struct.Struct('<4sBIIiiii')
+
+# Rewinding a replay being watched restores a snapshot and plays forward from it
+REWIND_TICKS = 50  # Ticks the left arrow key goes back
+REWIND_INTERVAL = 50  # Ticks between the snapshots taken while watching, at first
+REWIND_MEMORY = 64 * 1024 * 1024  # Bytes of snapshots kept before they are thinned out
+
+
+def init_display():
+    """Initialize Pygame and create the window, the first time it is needed."""
+    global window
+    if window is None:
+        pygame.init()
+        window = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption('Snake')
+    return window
+
+
+def cell_to_pixel(cell):
+    """Convert an engine cell (column, row) to the window position of its top-left corner."""
+    return (SIDE_MARGIN + BORDER_THICKNESS + cell[0] * SNAKE_SIZE,
+            TOP_MARGIN + BORDER_THICKNESS + cell[1] * SNAKE_SIZE)
+
+
+def play_area(cols, rows):
+    """Return the window rect showing a board, or the part of it in view if it is larger than the window."""
+    return pygame.Rect(SIDE_MARGIN + BORDER_THICKNESS, TOP_MARGIN + BORDER_THICKNESS,
+                       min(cols, COLS) * SNAKE_SIZE, min(rows, ROWS) * SNAKE_SIZE)
+
+
+def cell_rect(cell):
+    """Return the window rect covered by an engine cell."""
+    x, y = cell_to_pixel(cell)
+    return pygame.Rect(x, y, SNAKE_SIZE, SNAKE_SIZE)
+
+
+def segment_color(index, length):
+    """Return the gradient color of the segment index places behind the head."""
+    #  Make the color of the snake's head and tail changes with its length
+    color_ratio = index / length
+    return (
+        int(SNAKE_HEAD_COLOR[0] * (1 - color_ratio) + SNAKE_TAIL_COLOR[0] * color_ratio),
+        int(SNAKE_HEAD_COLOR[1] * (1 - color_ratio) + SNAKE_TAIL_COLOR[1] * color_ratio),
+        int(SNAKE_HEAD_COLOR[2] * (1 - color_ratio) + SNAKE_TAIL_COLOR[2] * color_ratio)
+    )
+
+
+def read_save(path):
+    """Read a game written by SnakeGame.save_game(); returns (state, replay, food animation)."""
+    with open(path, 'rb') as save_file:
+        data = save_file.read()
+    magic, version, state_size, replay_size, *food = SAVE_HEADER.unpack_from(data)
+    if magic != SAVE_MAGIC or version != SAVE_VERSION:
+        raise ValueError(f'{path} is not a saved Snake game')
+    state = memoryview(data)[SAVE_HEADER.size:SAVE_HEADER.size + state_size]
+    replay = Replay.from_bytes(data[SAVE_HEADER.size + state_size:])
+    return state, replay, food
+
+
+def cells_under(rect):
+    """Yield the engine cells that a window rect overlaps."""
+    left = (rect.left - SIDE_MARGIN - BORDER_THICKNESS) // SNAKE_SIZE
+    right = (rect.right - 1 - SIDE_MARGIN - BORDER_THICKNESS) // SNAKE_SIZE
+    top = (rect.top - TOP_MARGIN - BORDER_THICKNESS) // SNAKE_SIZE
+    bottom = (rect.bottom - 1 - TOP_MARGIN - BORDER_THICKNESS) // SNAKE_SIZE
+    for y in range(top, bottom + 1):
+        for x in range(left, right + 1):
+            yield (x, y)
+
+
+class MenuScene:
+    """A screen that waits for the player to press one of its keys.
+
+    Instead of polling, the scene sleeps in pygame.event.wait() until
+    something happens, so a menu left open uses next to no CPU. Scenes
+    with an animate callback also wake up every frame_time milliseconds
+    to run it.
+    """
+
+    def __init__(self, draw, choices, quit_result, animate=None, frame_time=0):
+        self.draw = draw  # paints the scene once when it is shown
+        self.choices = choices  # key -> result returned by run()
+        self.quit_result = quit_result  # result when the window is closed
+        self.animate = animate
+        self.frame_time = frame_time if animate else 0
+
+    def run(self):
+        """Show the scene and return the result of the key the player picked."""
+        self.draw()
+        pygame.display.update()
+
+        while True:
+            event = pygame.event.wait(self.frame_time)
+            if event.type == pygame.NOEVENT:
+                # Woken by the timeout: time for the next animation frame
+                self.animate()
+                pygame.display.update()
+            elif event.type == pygame.QUIT:
+                return self.quit_result
+            elif event.type == pygame.KEYDOWN and event.key in self.choices:
+                return self.choices[event.key]
+            elif event.type == pygame.WINDOWEXPOSED:
+                pygame.display.update()
+
+
+class RewindCheckpoints:
+    """Snapshots of the replay being watched, for rewinding it.
+
+    A snapshot is taken every interval ticks. Once they take more than
+    REWIND_MEMORY bytes, every other one is dropped and the interval
+    doubles, so a long replay on a big board keeps memory bounded and a
+    rewind replays more ticks from the nearest snapshot instead.
+    """
+
+    def __init__(self, interval=REWIND_INTERVAL, memory=REWIND_MEMORY):
+        self.interval = interval
+        self.memory = memory
+        self.snapshots = {}  # tick -> engine snapshot
+
+    def add(self, engine):
+        """Take a snapshot if the engine is on a checkpoint tick without one."""
+        tick = engine.ticks
+        if tick % self.interval or tick in self.snapshots:
+            return
+        snapshot = engine.snapshot()
+        self.snapshots[tick] = snapshot
+        # Tick 0 is always kept, so a rewind can always go back to the start
+        while len(self.snapshots) > 1 and len(self.snapshots) * len(snapshot) > self.memory:
+            self.interval *= 2
+            self.snapshots = {kept: data for kept, data in self.snapshots.items()
+                              if kept % self.interval == 0}
+
+    def before(self, tick):
+        """Return the last snapshot at or before tick, or None before the first one."""
+        if not self.snapshots:
+            return None
+        # Every multiple of the interval up to the furthest tick played has a snapshot
+        return self.snapshots[tick - tick % self.interval]
+
+
+class MiniMap:
+    """Downsampled picture of where the snake is on a large board.
+
+    Each minimap pixel stands for a block of cells and is lit while the
+    snake covers any of them. The number of covered cells per block is
+    updated one cell at a time as the snake moves, so the board is never
+    scanned after reset().
+    """
+
+    def __init__(self, cols, rows, size=MINIMAP_SIZE):
+        self.cols = cols
+        self.rows = rows
+        self.block = max(1, -(-max(cols, rows) // size))  # cells per minimap pixel, each way
+        self.width = -(-cols // self.block)
+        self.height = -(-rows // self.block)
+        self.counts = array('i', bytes(4 * self.width * self.height))
+        self.surface = pygame.Surface((self.width, self.height))
+
+        # Small boards get more than one screen pixel per minimap pixel
+        zoom = max(1, size // max(self.width, self.height))
+        self.rect = pygame.Rect(0, 0, self.width * zoom, self.height * zoom)
+        self.rect.topright = (WIDTH - SIDE_MARGIN - BORDER_THICKNESS - MINIMAP_MARGIN,
+                              TOP_MARGIN + BORDER_THICKNESS + MINIMAP_MARGIN)
+        self.scaled = pygame.Surface(self.rect.size)
+
+    def reset(self, snake_body):
+        """Start over with the cells of a new snake."""
+        self.counts = array('i', bytes(4 * self.width * self.height))
+        self.surface.fill(MINIMAP_BACKGROUND)
+        for cell in snake_body:
+            self.add(cell)
+
+    def add(self, cell):
+        """Count a cell the snake just moved onto."""
+        x, y = cell[0] // self.block, cell[1] // self.block
+        block = y * self.width + x
+        self.counts[block] += 1
+        if self.counts[block] == 1:
+            self.surface.set_at((x, y), SNAKE_HEAD_COLOR)
+
+    def remove(self, cell):
+        """Count a cell the snake just left."""
+        x, y = cell[0] // self.block, cell[1] // self.block
+        block = y * self.width + x
+        self.counts[block] -= 1
+        if self.counts[block] == 0:
+            self.surface.set_at((x, y), MINIMAP_BACKGROUND)
+
+    def draw(self, surface, food_pos, view):
+        """Draw the minimap with the food and the outline of the view rect (in cells)."""
+        pygame.transform.scale(self.surface, self.rect.size, self.scaled)
+        surface.blit(self.scaled, self.rect)
+        scale_x = self.rect.width / self.cols
+        scale_y = self.rect.height / self.rows
+        pygame.draw.rect(surface, RED, (self.rect.left + int(food_pos[0] * scale_x),
+                                        self.rect.top + int(food_pos[1] * scale_y), 2, 2))
+        pygame.draw.rect(surface, WHITE, (self.rect.left + int(view[0] * scale_x),
+                                          self.rect.top + int(view[1] * scale_y),
+                                          max(2, int(view[2] * scale_x)),
+                                          max(2, int(view[3] * scale_y))), 1)
+        return self.rect
+
+
+class ArenaMap:
+    """Picture of an arena board with one pixel per cell, scaled up to the play area.
+
+    Only the cells that changed in a tick are repainted, using a WorldView
+    to know which tails moved and which cells a dead snake covered, so
+    drawing a tick costs the same however long the snakes are. Scaling the
+    picture up costs the same however many snakes there are.
+    """
+
+    def __init__(self, cols, rows):
+        self.view = WorldView(cols, rows)
+        self.surface = pygame.Surface((cols, rows))
+        self.surface.fill(GRAY)
+        self.colors = [pygame.Color(0) for _ in range(ARENA_COLORS)]
+        for index, color in enumerate(self.colors):
+            color.hsva = (index * 360 / ARENA_COLORS, 80, 95, 100)
+
+        play_width = GAME_WIDTH - 2*BORDER_THICKNESS
+        play_height = GAME_HEIGHT - 2*BORDER_THICKNESS
+        scale = min(play_width / cols, play_height / rows)
+        self.rect = pygame.Rect(0, 0, int(cols * scale), int(rows * scale))
+        self.rect.center = (SIDE_MARGIN + GAME_WIDTH // 2, TOP_MARGIN + GAME_HEIGHT // 2)
+        self.scaled = pygame.Surface(self.rect.size)
+
+    def snake_color(self, snake_id):
+        return self.colors[snake_id % ARENA_COLORS]
+
+    def apply(self, changes):
+        """Repaint the cells changed by one step() of the arena's engine."""
+        view, cols = self.view, self.view.cols
+        cleared = []
+        for snake_id in changes['left'] + changes['died']:
+            cleared.extend(view.snakes.get(snake_id, ()))
+        for snake_id, head, grew in changes['moves']:
+            if not grew and snake_id in view.snakes:  # New snakes are painted whole below
+                cleared.append(view.snakes[snake_id][-1])
+        cleared.extend(old for old, new in changes['food'] if old is not None)
+        view.apply(changes)
+
+        set_at = self.surface.set_at
+        for cell in cleared:
+            if not view.occupied[cell] and cell not in view.food:
+                set_at((cell % cols, cell // cols), GRAY)
+        for snake_id, cells, direction in changes['spawned']:
+            if snake_id in view.snakes:
+                for cell in view.snakes[snake_id]:
+                    set_at((cell % cols, cell // cols), self.snake_color(snake_id))
+        for snake_id, head, grew in changes['moves']:
+            if snake_id in view.snakes:
+                set_at((head % cols, head // cols), self.snake_color(snake_id))
+        for old, new in changes['food']:
+            if new is not None and new in view.food:
+                set_at((new % cols, new // cols), RED)
+
+    def draw(self, surface):
+        pygame.transform.scale(self.surface, self.rect.size, self.scaled)
+        surface.blit(self.scaled, self.rect)
+        return self.rect
+
 
 class SnakeGame:
     # A class that make our game more easier to navigate and maintain
     # and make it easier to reuse and add new features or modify existing ones.
-    def __init__(self):
+    def __init__(self, dirty_rects=False, record_dir=None, profile=False, board=None, autopilot=False,
+                 save_path=SAVE_FILE, resume=None, grid=False, capture=None):
+        init_display()
         self.snake_color = BLUE
         self.bg_color = BLACK
         self.mute = False
         self.font = pygame.font.SysFont('arial', 28)
         self.small_font = pygame.font.SysFont('arial', 20)
+        self.text_cache = TextCache()
         self.clock = pygame.time.Clock()
+        if board is None:
+            self.engine = SnakeEngine(COLS, ROWS, start=START_CELL)
+        else:
+            cols, rows = board
+            self.engine = SnakeEngine(cols, rows, start=(cols // 4, rows // 2))
+        self.assets = AssetLoader()
         self.load_assets()
         
         # Add some color to food
@@ -53,242 +369,733 @@ class SnakeGame:
         self.color_direction = 1
         self.food_size = SNAKE_SIZE
         self.size_direction = 1
+
+        # Gradients by snake length, and a rounded segment sprite per color
+        self.palettes = {}
+        self.palette_sprites = {}
+        self.segment_sprites = {}
+
+        # Every game is recorded; with record_dir set, save_replay() writes it out
+        self.record_dir = record_dir
+        self.replay = None
+        self.watching = False
+
+        # The pause menu saves the game to save_path; resume is a read_save() result
+        # that the next game_loop() continues instead of starting a new game
+        self.save_path = save_path
+        self.resume = resume
+
+        # Only repaint the parts of the window that changed between frames
+        self.dirty_rects = dirty_rects
+        self.full_redraw = True
+
+        # A Snake_Capture.FrameCapture that game_loop() hands every frame to
+        self.capture = capture
+
+        # With the autopilot on, the snake steers itself and the arrow keys are ignored
+        self.autopilot = Autopilot(self.engine) if autopilot else None
+
+        # Boards larger than the play area are seen through a camera that follows the head
+        self.camera = self.engine.cols > COLS or self.engine.rows > ROWS
+        self.minimap = MiniMap(self.engine.cols, self.engine.rows) if self.camera else None
+
+        # Smaller boards get a smaller play area, so the walls are where the border is drawn
+        cols, rows = self.engine.cols, self.engine.rows
+        self.play_area = play_area(cols, rows)
+        self.cell_pixels = [] if self.camera else [cell_to_pixel((cell % cols, cell // cols))
+                                                   for cell in range(cols * rows)]
+
+        # With grid set, the whole snake is drawn as one scaled-up grid of cell colors.
+        # Its arrays cover the whole board, so the camera view, which only shows the
+        # part around the head, keeps drawing segments
+        self.grid_renderer = None
+        if grid and not self.camera:
+            from Snake_Grid import GridRenderer  # NumPy is only needed for this renderer
+            self.grid_renderer = GridRenderer(self.engine, SNAKE_SIZE, SNAKE_HEAD_COLOR,
+                                              SNAKE_TAIL_COLOR, SPRITE_COLORKEY)
+
+        # Frame timing, toggled with F3 and exported with F4
+        self.profiler = None
+        self.profiler_label = ''
+        if profile:
+            self.toggle_profiler()
     
+    def snake_palette(self, length):
+        """Return the segment colors, head first, of a snake with the given length."""
+        palette = self.palettes.get(length)
+        if palette is None:
+            if len(self.palettes) >= PALETTE_CACHE_SIZE:
+                self.palettes.clear()
+                self.palette_sprites.clear()
+            palette = [segment_color(index, length) for index in range(length)]
+            self.palettes[length] = palette
+        return palette
+
+    def segment_sprite(self, color):
+        """Return a rounded snake segment of the given color, rendered once per color."""
+        sprite = self.segment_sprites.get(color)
+        if sprite is None:
+            sprite = pygame.Surface((SNAKE_SIZE, SNAKE_SIZE)).convert()
+            sprite.fill(SPRITE_COLORKEY)
+            pygame.draw.rect(sprite, color, sprite.get_rect(), border_radius=8)
+            sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+            self.segment_sprites[color] = sprite
+        return sprite
+
+    def snake_sprites(self, length):
+        """Return the segment sprites, head first, of a snake with the given length."""
+        sprites = self.palette_sprites.get(length)
+        if sprites is None:
+            sprites = [self.segment_sprite(color) for color in self.snake_palette(length)]
+            self.palette_sprites[length] = sprites
+        return sprites
+
+    def draw_segment(self, cell, color):
+        """Draw one snake segment and return its rect."""
+        segment_rect = cell_rect(cell)
+        window.blit(self.segment_sprite(color), segment_rect)
+        return segment_rect
+
     def draw_snake(self, snake_body):
-        # Beautified the graphics of the snake
-        SNAKE_HEAD_COLOR = (31, 64, 238)
-        SNAKE_TAIL_COLOR = (0, 128, 128)
-        
-        for index, pos in enumerate(snake_body):
-            color_ratio = index / len(snake_body)
-            #  Make the color of the snake's head and tail changes with its length
-            segment_color = (
-                int(SNAKE_HEAD_COLOR[0] * (1 - color_ratio) + SNAKE_TAIL_COLOR[0] * color_ratio),
-                int(SNAKE_HEAD_COLOR[1] * (1 - color_ratio) + SNAKE_TAIL_COLOR[1] * color_ratio),
-                int(SNAKE_HEAD_COLOR[2] * (1 - color_ratio) + SNAKE_TAIL_COLOR[2] * color_ratio)
-            )
-            segment_rect = pygame.Rect(pos[0], pos[1], SNAKE_SIZE, SNAKE_SIZE)
-            pygame.draw.rect(window, segment_color, segment_rect, border_radius=8)
+        # Beautified the graphics of the snake, drawn in a single batch of sprite blits
+        positions = map(self.cell_pixels.__getitem__, snake_body.packed())
+        window.blits(zip(self.snake_sprites(len(snake_body)), positions), doreturn=False)
 
         
     def load_assets(self):
         """Load dynamic background and music with error handling"""
-        try:
-            if os.path.exists("background_music.mp3"):
-                pygame.mixer.music.load("background_music.mp3")
-                pygame.mixer.music.play(-1)
-            else:
-                print("Warning: background_music.mp3 not found")
-                
-            if os.path.exists("background_image.jpg"):
-                self.background_image = pygame.image.load("background_image.jpg")
-                self.background_image = pygame.transform.scale(
-                    self.background_image, 
-                    (GAME_WIDTH - 2*BORDER_THICKNESS, 
-                     GAME_HEIGHT - 2*BORDER_THICKNESS)
-                )
-            else:
-                print("Warning: background_image.jpg not found")
-                self.background_image = None
-        except pygame.error as e:
-            print(f"Error loading assets: {e}")
-            self.background_image = None
+        # The music starts playing once the loader thread has opened it
+        self.assets.load_music('background_music.mp3')
+
+        # The background image is loaded and scaled on a background thread and
+        # picked up by draw_background() once it is ready
+        self.background_image = None
+        self.assets.load_image('background_image', 'background_image.jpg',
+                               (GAME_WIDTH - 2*BORDER_THICKNESS, 
+                                GAME_HEIGHT - 2*BORDER_THICKNESS))
+
+        # The static background depends on the assets, so compose it again
+        self.background = None
 
     def show_message(self, text, color, pos):
         """Display a message on the screen."""
-        message = self.font.render(text, True, color)
+        message = self.text_cache.render(self.font, text, color)
         message_rect = message.get_rect(center=pos)
         window.blit(message, message_rect)
 
-    def draw_border(self):
+    def draw_border(self, surface):
         """Draw border around the game area."""
-        # Game area starts after TOP_MARGIN
-        game_rect = pygame.Rect(
-            SIDE_MARGIN, 
-            TOP_MARGIN, 
-            GAME_WIDTH, 
-            GAME_HEIGHT
-        )
-        pygame.draw.rect(window, WHITE, game_rect, BORDER_THICKNESS)
-
-    def generate_food_position(self, snake_body):
-        """Generate new food position ensuring it doesn't overlap with snake"""
-        while True:
-            food_pos = [
-                random.randrange(SIDE_MARGIN + BORDER_THICKNESS, 
-                               SIDE_MARGIN + GAME_WIDTH - BORDER_THICKNESS - SNAKE_SIZE, 
-                               SNAKE_SIZE),
-                random.randrange(TOP_MARGIN + BORDER_THICKNESS, 
-                               TOP_MARGIN + GAME_HEIGHT - BORDER_THICKNESS - SNAKE_SIZE, 
-                               SNAKE_SIZE)
-            ]
-            # Ensures food does not spawn on the snake body
-            if food_pos not in snake_body:
-                return food_pos
+        game_rect = self.play_area.inflate(2 * BORDER_THICKNESS, 2 * BORDER_THICKNESS)
+        pygame.draw.rect(surface, WHITE, game_rect, BORDER_THICKNESS)
 
-    def handle_input(self, event, direction):
-        """Handle keyboard input"""
+    def handle_input(self, event, turns):
+        """Handle keyboard input, queuing arrow keys as turns for the next ticks"""
         if event.type == pygame.KEYDOWN:
             key_direction = {
-                pygame.K_UP: ('UP', 'DOWN'),
-                pygame.K_DOWN: ('DOWN', 'UP'),
-                pygame.K_LEFT: ('LEFT', 'RIGHT'),
-                pygame.K_RIGHT: ('RIGHT', 'LEFT')
+                pygame.K_UP: 'UP',
+                pygame.K_DOWN: 'DOWN',
+                pygame.K_LEFT: 'LEFT',
+                pygame.K_RIGHT: 'RIGHT'
             }
             
             if event.key in key_direction:
-                new_dir, opposite = key_direction[event.key]
-                if direction != opposite:
-                    return new_dir
+                turns.push(key_direction[event.key])  # Reversals are dropped by the queue
             elif event.key == pygame.K_m:
                 self.toggle_mute()
-                
-        return direction
+            elif event.key == pygame.K_F3:
+                self.toggle_profiler()
+            elif event.key == pygame.K_F4 and self.profiler:
+                path = f'snake-profile-{time.strftime("%Y%m%d-%H%M%S")}.trace.json'
+                self.profiler.export(path)
+                print(f"Frame profile written to {path}")
 
     def toggle_mute(self):
         """Toggle music mute state"""
         self.mute = not self.mute
         pygame.mixer.music.set_volume(0 if self.mute else 1)
 
-    def check_collision(self, snake_pos):
-        """Check if snake has collided with walls or itself"""
-        # Wall collision - adjusted for new game area position
-        if (snake_pos[0] < SIDE_MARGIN + BORDER_THICKNESS or 
-            snake_pos[0] >= SIDE_MARGIN + GAME_WIDTH - BORDER_THICKNESS or
-            snake_pos[1] < TOP_MARGIN + BORDER_THICKNESS or 
-            snake_pos[1] >= TOP_MARGIN + GAME_HEIGHT - BORDER_THICKNESS):
-            return True
-            
-        # Self collision
-        if snake_pos in self.snake_body[1:]:
-            return True
-            
-        return False
+    def toggle_profiler(self):
+        """Start or stop timing the phases of each frame, and the graph that shows them."""
+        engine = self.engine
+        if self.profiler is None:
+            self.profiler = profiler = FrameProfiler(budget_ms=1000 / RENDER_FPS)
+            generate_food_position = engine.generate_food_position
+
+            # Food is placed inside engine.step(), so time it separately from the movement
+            def timed_generate_food_position(snake_body):
+                profiler.mark('movement')
+                food_pos = generate_food_position(snake_body)
+                profiler.mark('food_spawn')
+                return food_pos
+
+            engine.generate_food_position = timed_generate_food_position
+        else:
+            self.profiler = None
+            del engine.generate_food_position
+        self.full_redraw = True
+
+    def mark(self, phase):
+        """End a phase of the frame, if the profiler is on."""
+        if self.profiler:
+            self.profiler.mark(phase)
+
+    def draw_profiler(self):
+        """Draw the frame-time graph and the average busy time; returns the rect they cover."""
+        profiler = self.profiler
+        self.restore_background(PROFILER_AREA)
+        profiler.draw_graph(window, PROFILER_GRAPH)
+        if profiler.count % 30 == 0 or not self.profiler_label:
+            self.profiler_label = f'{profiler.average_busy_ms():.1f} ms'
+        label = self.text_cache.render(self.small_font, self.profiler_label, WHITE)
+        window.blit(label, (PROFILER_GRAPH.left - 10 - label.get_width(), HEIGHT - 30))
+        profiler.mark('overlay')
+        return PROFILER_AREA
 
     def draw_game_info(self, score, speed):
         """Draw game information outside the border"""
         # Draw score at top
-        score_text = self.font.render(f'Score: {score}', True, WHITE)
+        score_text = self.text_cache.render(self.font, f'Score: {score}', WHITE)
         window.blit(score_text, (SIDE_MARGIN, 10))
         
         # Draw speed at top right
-        speed_text = self.small_font.render(f'Speed: {speed}', True, WHITE)
+        speed_text = self.text_cache.render(self.small_font, f'Speed: {speed}', WHITE)
         window.blit(speed_text, (WIDTH - SIDE_MARGIN - speed_text.get_width(), 15))
+
+    def draw_food(self, food_pos):
+        """Draw the food and return its rect."""
+        food_x, food_y = cell_to_pixel(food_pos)
+        food_rect = pygame.Rect(food_x, food_y, self.food_size, self.food_size)
+        pygame.draw.rect(window, tuple(self.food_color), food_rect)
+        return food_rect
+
+    def build_background(self):
+        """Compose everything that stays the same during a game on one surface."""
+        background = pygame.Surface(window.get_size()).convert()
+        background.fill(BLACK)
+        
+        # Draw game area background
+        pygame.draw.rect(background, GRAY, self.play_area)
         
+        if self.background_image:
+            background.blit(self.background_image, self.play_area,
+                            pygame.Rect((0, 0), self.play_area.size))
+            
+        self.draw_border(background)
+
         # Draw controls at bottom
-        controls_text = self.small_font.render('P: Pause  M: Mute  Arrow Keys: Move', True, WHITE)
-        window.blit(controls_text, (SIDE_MARGIN, HEIGHT - 30))
-
-    def game_loop(self):
-        """Main game loop"""
-        self.snake_pos = [SIDE_MARGIN + GAME_WIDTH//4, TOP_MARGIN + GAME_HEIGHT//2]
-        self.snake_body = [self.snake_pos[:]]
-        direction = 'RIGHT'
-        food_pos = self.generate_food_position(self.snake_body)
-        score = 0
-        speed = FPS
+        controls_text = self.text_cache.render(self.small_font, 'P: Pause  M: Mute  Arrow Keys: Move', WHITE)
+        background.blit(controls_text, (SIDE_MARGIN, HEIGHT - 30))
+        return background
+
+    def draw_background(self):
+        """Draw the static background, composing it again after a resize or asset change."""
+        background_image = self.assets.take('background_image')
+        if background_image is not None:
+            self.background_image = background_image
+            self.background = None
+        if self.background is None or self.background.get_size() != window.get_size():
+            self.background = self.build_background()
+        window.blit(self.background, (0, 0))
+
+    def restore_background(self, rect):
+        """Paint the static background back over one rect of the window."""
+        window.blit(self.background, rect, rect)
+
+    def draw_moving_snake(self, snake_body, progress, old_head, old_tail):
+        """Draw the snake part of the way through its last move.
+
+        The head slides from old_head into its new cell, and unless the snake
+        just grew, a tail segment slides from old_tail after the rest of the
+        body. progress runs from 0 (previous tick) to 1 (current tick).
+        """
+        sprites = self.snake_sprites(len(snake_body))
+        positions = [self.cell_pixels[cell] for cell in snake_body.packed()]
+
+        def between(start, end):
+            return (round(start[0] + (end[0] - start[0]) * progress),
+                    round(start[1] + (end[1] - start[1]) * progress))
+
+        blits = []
+        if snake_body[-1] != old_tail:
+            blits.append((sprites[-1], between(cell_to_pixel(old_tail), positions[-1])))
+        blits.extend(zip(sprites[:0:-1], positions[:0:-1]))
+        blits.append((sprites[0], between(cell_to_pixel(old_head), positions[0])))
+        window.blits(blits, doreturn=False)
+
+    def draw_whole_frame(self, engine, draw_snake, draw_food=None, draw_overlay=None):
+        """Draw the background, the HUD, the snake with draw_snake(), the food and
+        any overlay, then update the whole window.
+
+        Without draw_food, the food is drawn at engine.food_pos and its rect kept
+        in food_rect for the dirty-rect renderer.
+        """
+        self.draw_background()
+        self.mark('background')
+        self.draw_game_info(engine.score, engine.speed)
+        self.mark('hud')
+
+        draw_snake()
+        self.mark('draw_snake')
+
+        if draw_food is None:
+            self.food_rect = self.draw_food(engine.food_pos)
+        else:
+            draw_food()
+        self.mark('draw_food')
+
+        if draw_overlay is not None:
+            draw_overlay()
+            self.mark('overlay')
+        if self.profiler:
+            self.draw_profiler()
+
+        pygame.display.update()
+        self.mark('update')
+
+    def draw_frame(self, engine, progress=1.0, old_head=None, old_tail=None):
+        """Draw everything and update the whole window.
+
+        With old_head and old_tail the snake is drawn progress of the way
+        through its last move, for smooth motion between ticks.
+        """
+        def draw_snake():
+            if old_head is None or progress >= 1:
+                self.draw_snake(engine.snake_body)
+            else:
+                self.draw_moving_snake(engine.snake_body, progress, old_head, old_tail)
+
+        self.draw_whole_frame(engine, draw_snake)
+
+    def camera_origin(self, engine):
+        """Return the board cell in the top-left corner of the view, keeping the head
+        in the middle of the view without showing anything past the board edges."""
+        head_x, head_y = engine.snake_pos
+        return (max(0, min(head_x - COLS // 2, engine.cols - COLS)),
+                max(0, min(head_y - ROWS // 2, engine.rows - ROWS)))
+
+    def draw_frame_camera(self, engine):
+        """Draw the part of a large board around the head and update the whole window.
+
+        Only the cells in view are looked at: each row of the view is
+        searched in the snake's occupancy bitmap and a segment's gradient
+        color comes from its index in the body. The cost depends on the size
+        of the window, not on the size of the board or the length of the snake.
+        """
+        left, top = self.camera_origin(engine)
+
+        def draw_snake():
+            cols = engine.cols
+            snake_body = engine.snake_body
+            length = len(snake_body)
+            blits = []
+            for y in range(top, min(top + ROWS, engine.rows)):
+                row = y * cols
+                end = row + min(left + COLS, cols)
+                cell = snake_body.find_occupied(row + left, end)
+                while cell != -1:
+                    sprite = self.segment_sprite(segment_color(snake_body.index_of(cell), length))
+                    blits.append((sprite, cell_to_pixel((cell - row - left, y - top))))
+                    cell = snake_body.find_occupied(cell + 1, end)
+            window.blits(blits, doreturn=False)
+
+        def draw_food():
+            # Only when it is in view
+            food_x, food_y = engine.food_pos
+            if left <= food_x < left + COLS and top <= food_y < top + ROWS:
+                self.draw_food((food_x - left, food_y - top))
+
+        def draw_minimap():
+            self.minimap.draw(window, engine.food_pos, (left, top, COLS, ROWS))
+
+        self.draw_whole_frame(engine, draw_snake, draw_food, draw_minimap)
+
+    def draw_frame_grid(self, engine):
+        """Draw everything with the snake coming from the grid renderer and update the whole window.
+
+        The snake is one blit whatever its length; like the dirty-rect
+        renderer it is drawn in whole cells, without motion between ticks,
+        and its colors are only patched for one move unless full_redraw is set.
+        """
+        def draw_snake():
+            window.blit(self.grid_renderer.render(full=self.full_redraw), cell_to_pixel((0, 0)))
+
+        self.draw_whole_frame(engine, draw_snake)
+
+    def draw_frame_dirty(self, engine):
+        """Repaint only what changed since the last frame and update just those rects.
+
+        The picture is the same as draw_frame(): the background comes back
+        under the vacated tail and the old food, and besides the head only
+        the segments whose gradient color changed are redrawn.
+        """
+        snake_body = engine.snake_body
+        length = len(snake_body)
+
+        if self.full_redraw:
+            self.draw_frame(engine)
+            self.full_redraw = False
+            # Remember what is on screen so the next frames can be patched
+            self.palette = self.snake_palette(length)
+            self.palette_changes = [index + 1 for index in range(length - 1)
+                                    if self.palette[index] != self.palette[index + 1]]
+            self.segment_colors = dict(zip(snake_body, self.palette))
+            self.last_tail = snake_body[-1]
+            self.last_info = (engine.score, engine.speed)
+            return
+
+        # Clear the old food and the segments it was drawn over
+        dirty = [self.food_rect]
+        self.restore_background(self.food_rect)
+        for cell in cells_under(self.food_rect):
+            if cell in self.segment_colors:
+                self.draw_segment(cell, self.segment_colors[cell])
+
+        # Clear the cell the tail just left
+        if self.last_tail not in snake_body:
+            dirty.append(cell_rect(self.last_tail))
+            self.restore_background(dirty[-1])
+            del self.segment_colors[self.last_tail]
+        self.last_tail = snake_body[-1]
+        self.mark('background')
+
+        # A new length changes the whole gradient; otherwise every segment moved
+        # one step down the same gradient and only changes color where it does
+        if length != len(self.palette):
+            self.palette = self.snake_palette(length)
+            self.palette_changes = [index + 1 for index in range(length - 1)
+                                    if self.palette[index] != self.palette[index + 1]]
+            repaint = range(length)
+        else:
+            repaint = [0, 1] + self.palette_changes if length > 1 else [0]
+        for index in repaint:
+            cell = snake_body[index]
+            self.segment_colors[cell] = self.palette[index]
+            dirty.append(self.draw_segment(cell, self.palette[index]))
+        self.mark('draw_snake')
+
+        # Draw food
+        self.food_rect = self.draw_food(engine.food_pos)
+        dirty.append(self.food_rect)
+        self.mark('draw_food')
+
+        # Score and speed only change when food is eaten
+        if (engine.score, engine.speed) != self.last_info:
+            self.last_info = (engine.score, engine.speed)
+            info_rect = pygame.Rect(0, 0, WIDTH, TOP_MARGIN)
+            self.restore_background(info_rect)
+            self.draw_game_info(engine.score, engine.speed)
+            dirty.append(info_rect)
+        self.mark('hud')
+        if self.profiler:
+            dirty.append(self.draw_profiler())
+
+        pygame.display.update(dirty)
+        self.mark('update')
+
+    def game_loop(self, replay=None):
+        """Main game loop
+
+        With a replay, its recorded turns are played instead of the keyboard,
+        up to the tick the recording ends on.
+        """
+        # Movement, collisions and food are handled by the headless engine.
+        # A fresh seed per game lets the replay reproduce the food positions
+        engine = self.engine
+        self.watching = replay is not None
+        if self.watching:
+            if (replay.cols, replay.rows, replay.start) != (engine.cols, engine.rows, engine.start):
+                raise ValueError('replay was recorded on a different board')
+            seed = replay.seed
+            replay_turns = replay.turns()
+        else:
+            seed = random.getrandbits(63)
+        if self.resume and not self.watching:
+            self.load_game(*self.resume)
+            self.resume = None
+        else:
+            engine.reset(seed)
+            self.replay = Replay.for_engine(engine, seed)
+        if self.autopilot:
+            self.autopilot.reset()
+        if self.minimap:
+            self.minimap.reset(engine.snake_body)
+        turns = TurnQueue(engine.direction)
+        self.full_redraw = True
+        checkpoints = RewindCheckpoints()
+
+        # The snake moves at a fixed rate of engine.speed ticks per second, while
+        # frames are drawn at RENDER_FPS; lag is the time not yet simulated
+        old_head = old_tail = engine.snake_pos
+        lag = 0.0
+        last_time = time.perf_counter()
 
         while True:
-            self.update_food_properties()
+            if self.profiler:
+                self.profiler.begin_frame()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     return 'quit'
-                direction = self.handle_input(event, direction)
+                self.handle_input(event, turns)
+                if self.watching and event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
+                    self.rewind(checkpoints, replay_turns)
+                    old_head, old_tail = engine.snake_pos, engine.snake_body[-1]
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
-                    if self.pause_menu() == 'restart':
+                    # A replay being watched is not a game to resume
+                    result = self.pause_menu(can_save=not self.watching)
+                    while result == 'save':
+                        try:
+                            result = self.pause_menu(f'Saved to {self.save_game()}')
+                        except OSError as error:
+                            result = self.pause_menu(f'Could not save: {error.strerror or error}', RED)
+                    if result == 'restart':
                         return 'restart'
+                    self.full_redraw = True  # The pause overlay covers everything
+                    last_time = time.perf_counter()  # Don't catch up on the pause
+                    if self.profiler:
+                        self.profiler.begin_frame()
+            self.mark('events')
 
-            # Update snake position
-            move = {
-                'UP': (0, -SNAKE_SIZE),
-                'DOWN': (0, SNAKE_SIZE),
-                'LEFT': (-SNAKE_SIZE, 0),
-                'RIGHT': (SNAKE_SIZE, 0)
-            }
-            dx, dy = move[direction]
-            self.snake_pos = [self.snake_pos[0] + dx, self.snake_pos[1] + dy]
+            now = time.perf_counter()
+            lag += min(now - last_time, MAX_FRAME_TIME)
+            last_time = now
 
-            # Check collisions
-            if self.check_collision(self.snake_pos):
-                return 'game_over'
+            moves = 0
+            while lag >= 1 / engine.speed:
+                if self.watching and engine.ticks >= replay.ticks:
+                    # A game that was quit or restarted ends here, not at a wall
+                    return 'game_over'
+                lag -= 1 / engine.speed
+                old_head, old_tail = engine.snake_pos, engine.snake_body[-1]
 
-            # Update snake body
-            self.snake_body.insert(0, list(self.snake_pos))
-            
-            # Check food collision
-            if (abs(self.snake_pos[0] - food_pos[0]) < SNAKE_SIZE and 
-                abs(self.snake_pos[1] - food_pos[1]) < SNAKE_SIZE):
-                score += 1
-                speed = min(FPS + score // 5, 25)  # Increase speed with score
-                food_pos = self.generate_food_position(self.snake_body)
-            else:
-                self.snake_body.pop()
+                # Move the snake one queued turn at a time
+                if self.watching:
+                    checkpoints.add(engine)
+                    turn = replay_turns.get(engine.ticks + 1)
+                elif self.autopilot:
+                    turn = self.autopilot.choose()
+                else:
+                    turn = turns.pop()
+                if self.tick(turn):
+                    return 'game_over'
+                moves += 1
 
             # Draw everything
-            window.fill(BLACK)  # Clear entire window
-            if self.background_image:
-                window.blit(self.background_image, 
-                            (SIDE_MARGIN + BORDER_THICKNESS, 
-                            TOP_MARGIN + BORDER_THICKNESS))
-            
-            # Draw game area background
-            pygame.draw.rect(window, GRAY, 
-                           (SIDE_MARGIN + BORDER_THICKNESS, 
-                            TOP_MARGIN + BORDER_THICKNESS,
-                            GAME_WIDTH - 2*BORDER_THICKNESS,
-                            GAME_HEIGHT - 2*BORDER_THICKNESS))
-            
-            if self.background_image:
-                window.blit(self.background_image, 
-                          (SIDE_MARGIN + BORDER_THICKNESS, 
-                           TOP_MARGIN + BORDER_THICKNESS))
-                
-            self.draw_border()
-            self.draw_game_info(score, speed)
+            if self.camera:
+                # The view scrolls with the head, so the whole play area changes every tick
+                self.draw_frame_camera(engine)
+            elif self.grid_renderer:
+                # Whole cells only, so frames without a move would look the same.
+                # Its colors are patched for one move; after several, paint them all
+                if moves > 1:
+                    self.full_redraw = True
+                if moves or self.full_redraw:
+                    self.draw_frame_grid(engine)
+                    self.full_redraw = False
+            elif self.dirty_rects:
+                # The dirty-rect renderer only draws whole cells, so skip frames without a move.
+                # It patches the window for one move; after catching up on several, repaint it all
+                if moves > 1:
+                    self.full_redraw = True
+                if moves or self.full_redraw:
+                    self.draw_frame_dirty(engine)
+            else:
+                self.draw_frame(engine, lag * engine.speed, old_head, old_tail)
+            if self.capture:
+                # Frames the renderer skipped are still on screen, so every frame is offered
+                self.capture.capture(window)
+                self.mark('capture')
+            self.clock.tick(RENDER_FPS)
+            self.mark('wait')
+            if self.profiler:
+                self.profiler.end_frame()
 
-            # Draw snake
-            self.draw_snake(self.snake_body)
+    def network_loop(self, connection):
+        """Play on a Snake_Server as a thin client until the window is closed or the
+        server goes away.
 
+        The server runs the game; this only sends the arrow keys and draws the
+        board that the connection keeps up to date. Returns 'quit' or 'disconnected'.
+        """
+        view = connection.view
+        if view.cols > COLS or view.rows > ROWS:
+            raise ValueError(f'server board {view.cols}x{view.rows} does not fit the {COLS}x{ROWS} window')
+        pixels = [cell_to_pixel(view.cell_pos(cell)) for cell in range(view.cols * view.rows)]
+        self.play_area = play_area(view.cols, view.rows)
+        self.background = None
+        other_sprite = self.segment_sprite(OTHER_SNAKE_COLOR)
+        turns = TurnQueue('RIGHT')
+        last_tick = view.tick
 
-            # Draw food
-            pygame.draw.rect(window, tuple(self.food_color), 
-                         pygame.Rect(food_pos[0], food_pos[1], self.food_size, self.food_size))
+        while True:
+            if not connection.poll():
+                return 'disconnected'
+            if view.tick != last_tick:
+                last_tick = view.tick
+                self.update_food_properties()
+            own_snake = view.snakes.get(connection.snake_id)
+            if own_snake is not None and not turns.turns:
+                turns.last = view.directions[connection.snake_id]
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return 'quit'
+                self.handle_input(event, turns)
+            turn = turns.pop()
+            while turn is not None:
+                connection.send_turn(turn)
+                turn = turns.pop()
 
+            self.draw_background()
+            self.draw_game_info(view.scores.get(connection.snake_id, 0), connection.tick_rate)
+            blits = []
+            for snake_id, cells in view.snakes.items():
+                if snake_id != connection.snake_id:
+                    blits.extend((other_sprite, pixels[cell]) for cell in cells)
+            if own_snake is not None:
+                blits.extend(zip(self.snake_sprites(len(own_snake)), map(pixels.__getitem__, own_snake)))
+            window.blits(blits, doreturn=False)
+            for food in view.food:
+                self.draw_food(view.cell_pos(food))
+            if own_snake is None:
+                self.show_message('Waiting for a new snake...', WHITE, (WIDTH // 2, HEIGHT // 2))
             pygame.display.update()
-            self.clock.tick(speed)
+            self.clock.tick(RENDER_FPS)
 
-    def pause_menu(self):
-        """
-        You can pause to attend to urgent matters and then come back to your journey anytime!
+    def arena_loop(self, snakes, board=ARENA_BOARD, seed=None):
+        """Watch an arena of AI snakes until the window is closed; returns 'quit' or 'restart'.
+
+        The arena ticks at ARENA_TICK_RATE whatever the frame rate is, and
+        every snake is steered by the same ArenaPilot.
         """
-        overlay = pygame.Surface((WIDTH, HEIGHT))
-        overlay.fill(BLACK)
-        overlay.set_alpha(200)
-        window.blit(overlay, (0, 0))
-        
-        options = [
-            ('Paused', -60),
-            ('Press C to Continue', 0),
-            ('Press R to Restart', 40),
-            ('Press Q to Quit', 80)
-        ]
-        
-        for text, y_offset in options:
-            self.show_message(text, WHITE, (WIDTH // 2, HEIGHT // 2 + y_offset))
-        
-        pygame.display.update()
-        
+        arena = Arena(*board, snakes, seed)
+        arena_map = ArenaMap(*board)
+        lag = 0.0
+        last_time = time.perf_counter()
+
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     return 'quit'
                 if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_c:
-                        return 'continue'
-                    if event.key == pygame.K_r:
-                        return 'restart'
-                    if event.key == pygame.K_q:
-                        return 'quit'
+                    if event.key == pygame.K_m:
+                        self.toggle_mute()
+                    elif event.key == pygame.K_p:
+                        result = self.pause_menu(can_save=False)
+                        if result != 'continue':
+                            return result
+                        last_time = time.perf_counter()  # Don't catch up on the pause
+
+            now = time.perf_counter()
+            lag += min(now - last_time, MAX_FRAME_TIME)
+            last_time = now
+            while lag >= 1 / ARENA_TICK_RATE:
+                lag -= 1 / ARENA_TICK_RATE
+                arena_map.apply(arena.step())
+
+            self.draw_background()
+            arena_map.draw(window)
+            alive = arena.engine.snakes.values()
+            longest = max((len(snake.cells) for snake in alive), default=0)
+            alive_text = self.text_cache.render(self.font, f'Snakes: {len(alive)}/{snakes}', WHITE)
+            window.blit(alive_text, (SIDE_MARGIN, 10))
+            longest_text = self.text_cache.render(self.small_font, f'Longest: {longest}', WHITE)
+            window.blit(longest_text, (WIDTH - SIDE_MARGIN - longest_text.get_width(), 15))
+            pygame.display.update()
+            self.clock.tick(RENDER_FPS)
+
+    def tick(self, turn):
+        """Run one game tick: animate the food, record the turn, move the snake, eat food
+        and check collisions. Returns True when the game is over."""
+        self.update_food_properties()
+        engine = self.engine
+        if turn is not None:
+            self.replay.record(engine.ticks + 1, turn)
+        old_tail = engine.snake_body[-1]
+        state, reward, done = engine.step(turn)
+        self.replay.ticks = engine.ticks
+        if self.minimap and not done:
+            self.minimap.add(engine.snake_pos)
+            if old_tail not in engine.snake_body:
+                self.minimap.remove(old_tail)
+        self.mark('movement')
+        return done
+
+    def rewind(self, checkpoints, replay_turns):
+        """Go back REWIND_TICKS in the replay being watched: restore the last snapshot
+        before that point and play the recorded turns forward from it."""
+        engine = self.engine
+        target = max(0, engine.ticks - REWIND_TICKS)
+        snapshot = checkpoints.before(target)
+        if snapshot is None:
+            return  # Nothing played yet
+        engine.restore(snapshot)
+        while engine.ticks < target:
+            engine.step(replay_turns.get(engine.ticks + 1))
+        if self.minimap:
+            self.minimap.reset(engine.snake_body)
+        self.full_redraw = True
+
+    def save_game(self):
+        """Write the game in progress to save_path; returns the path.
+
+        The engine's state buffer is written as it is, next to the replay
+        recorded so far, so a resumed game keeps recording the same replay.
+        """
+        engine = self.engine
+        engine.pack()
+        replay = self.replay.to_bytes()
+        with open(self.save_path, 'wb') as save_file:
+            save_file.write(SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, len(engine.buffer), len(replay),
+                                             self.food_color[1], self.color_direction,
+                                             self.food_size, self.size_direction))
+            save_file.write(engine.buffer)
+            save_file.write(replay)
+        return self.save_path
+
+    def load_game(self, state, replay, food):
+        """Continue a game read by read_save()."""
+        self.engine.restore(state)
+        self.replay = replay
+        self.food_color[1], self.color_direction, self.food_size, self.size_direction = food
+
+    def save_replay(self):
+        """Write the last game to record_dir, if recording; returns the file name."""
+        if self.record_dir is None or self.replay is None or self.watching:
+            return None
+        os.makedirs(self.record_dir, exist_ok=True)
+        path = os.path.join(self.record_dir, f'snake-{time.strftime("%Y%m%d-%H%M%S")}-{self.replay.seed:x}.replay')
+        self.replay.save(path)
+        return path
+
+    def draw_overlay(self):
+        """Darken the current frame so a menu can be shown on top of it."""
+        overlay = pygame.Surface((WIDTH, HEIGHT))
+        overlay.fill(BLACK)
+        overlay.set_alpha(200)
+        window.blit(overlay, (0, 0))
+
+    def pause_menu(self, message=None, message_color=GREEN, can_save=True):
+        """
+        You can pause to attend to urgent matters and then come back to your journey anytime!
+        Saving lets you come back even after closing the game.
+        """
+        options = ['Press C to Continue', 'Press S to Save', 'Press R to Restart', 'Press Q to Quit']
+        if not can_save:
+            options.remove('Press S to Save')
+
+        def draw():
+            self.draw_overlay()
+            
+            self.show_message('Paused', WHITE, (WIDTH // 2, HEIGHT // 2 - 80))
+            for index, text in enumerate(options):
+                self.show_message(text, WHITE, (WIDTH // 2, HEIGHT // 2 - 20 + 40 * index))
+            if message:
+                message_text = self.text_cache.render(self.small_font, message, message_color)
+                window.blit(message_text, message_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 150)))
+
+        choices = {pygame.K_c: 'continue', pygame.K_r: 'restart', pygame.K_q: 'quit'}
+        if can_save:
+            choices[pygame.K_s] = 'save'
+        return MenuScene(draw, choices, 'quit').run()
     
     def update_food_properties(self):
         # Make the food randomly shifts in both color and size
@@ -304,51 +1111,105 @@ class SnakeGame:
 
     def game_over_screen(self):
         """Display game over screen"""
-        overlay = pygame.Surface((WIDTH, HEIGHT))
-        overlay.fill(BLACK)
-        overlay.set_alpha(200)
-        window.blit(overlay, (0, 0))
-        
-        self.show_message('Game Over!', RED, (WIDTH // 2, HEIGHT // 2 - 40))
-        self.show_message('Press Y to Play Again or N to Quit', WHITE, (WIDTH // 2, HEIGHT // 2 + 20))
-        pygame.display.update()
-        
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_y:
-                        return True
-                    if event.key == pygame.K_n:
-                        return False
+        def draw():
+            self.draw_overlay()
+            
+            # Filling the whole board leaves no room for food and wins the game
+            if self.engine.won:
+                self.show_message('You Win!', GREEN, (WIDTH // 2, HEIGHT // 2 - 40))
+            elif not self.engine.done:
+                self.show_message('End of Replay', WHITE, (WIDTH // 2, HEIGHT // 2 - 40))
+            else:
+                self.show_message('Game Over!', RED, (WIDTH // 2, HEIGHT // 2 - 40))
+            self.show_message('Press Y to Play Again or N to Quit', WHITE, (WIDTH // 2, HEIGHT // 2 + 20))
+
+        return MenuScene(draw, {pygame.K_y: True, pygame.K_n: False}, False).run()
 
     def start_screen(self):
         """Display start screen"""
-        window.fill(self.bg_color)
-        self.show_message('Snake Game', GREEN, (WIDTH // 2, HEIGHT // 3))
-        self.show_message('Press Y to Start or N to Quit', WHITE, (WIDTH // 2, HEIGHT // 2))
-        pygame.display.update()
-        
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_y:
-                        return True
-                    if event.key == pygame.K_n:
-                        return False
+        def draw():
+            window.fill(self.bg_color)
+            self.show_message('Snake Game', GREEN, (WIDTH // 2, HEIGHT // 3))
+            self.show_message('Press Y to Start or N to Quit', WHITE, (WIDTH // 2, HEIGHT // 2))
+
+        return MenuScene(draw, {pygame.K_y: True, pygame.K_n: False}, False).run()
 
 def main():
-    game = SnakeGame()
-    
+    parser = argparse.ArgumentParser(description='Snake')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only repaint the parts of the window that change')
+    parser.add_argument('--grid', action='store_true',
+                        help='draw the snake as one scaled-up grid of cell colors (needs NumPy); '
+                             'boards larger than the window are drawn as usual')
+    parser.add_argument('--record', metavar='DIR', help='save a replay of every game in DIR')
+    parser.add_argument('--replay', metavar='FILE', help='watch a recorded game')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='time every frame and write the timings to FILE on exit '
+                             '(.csv, .json or .trace.json for a Chrome trace)')
+    parser.add_argument('--board', type=board_size, metavar='COLSxROWS',
+                        help=f'play on a board of this size instead of {COLS}x{ROWS}; boards larger '
+                             'than the window scroll with the snake and show a minimap')
+    parser.add_argument('--autopilot', action='store_true', help='let the computer steer the snake')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='join a game on a Snake_Server.py server')
+    parser.add_argument('--save', metavar='FILE', default=SAVE_FILE,
+                        help=f'where the pause menu saves the game (default {SAVE_FILE})')
+    parser.add_argument('--resume', metavar='FILE', help='continue a game saved from the pause menu')
+    parser.add_argument('--arena', type=int, metavar='SNAKES',
+                        help=f'watch this many AI snakes share one board ({ARENA_BOARD[0]}x{ARENA_BOARD[1]} '
+                             'unless --board is given)')
+    parser.add_argument('--capture', metavar='PATH',
+                        help='record the games to PATH: a .y4m video (needs NumPy), raw .rgb frames, '
+                             'or otherwise a directory of PNG frames')
+    args = parser.parse_args()
+
+    if args.arena:
+        game = SnakeGame()
+        while game.start_screen() and game.arena_loop(args.arena, args.board or ARENA_BOARD) == 'restart':
+            pass
+        pygame.quit()
+        return
+
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        connection = Connection(host or 'localhost', int(port))
+        game = SnakeGame()
+        try:
+            if game.network_loop(connection) == 'disconnected':
+                print('The server closed the connection')
+        finally:
+            connection.close()
+            pygame.quit()
+        return
+
+    replay = Replay.load(args.replay) if args.replay else None
+    resume = read_save(args.resume) if args.resume else None
+    board = args.board
+    # Replays and saved games are played on the board they were recorded on
+    recorded = replay or (resume and resume[1])
+    if recorded and board is None and (recorded.cols, recorded.rows) != (COLS, ROWS):
+        board = (recorded.cols, recorded.rows)
+    capture = FrameCapture(args.capture, (WIDTH, HEIGHT), RENDER_FPS) if args.capture else None
+    game = SnakeGame(dirty_rects=args.dirty_rects, record_dir=args.record, profile=bool(args.profile),
+                     board=board, autopilot=args.autopilot, save_path=args.save, resume=resume,
+                     grid=args.grid, capture=capture)
+    try:
+        play(game, replay)
+    finally:
+        if args.profile and game.profiler:
+            game.profiler.export(args.profile)
+        if capture:
+            print(capture.close())
+
+
+def play(game, replay=None):
+    """Show the start screen and play games until the player quits."""
     while True:
         if not game.start_screen():
             break
             
         while True:
-            result = game.game_loop()
+            result = game.game_loop(replay)
+            game.save_replay()
             if result == 'quit':
                 pygame.quit()
                 return
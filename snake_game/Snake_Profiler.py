@@ -0,0 +1,133 @@
+"""Per-phase frame timing for SnakeGame.game_loop.
+
+The game calls mark(phase) as it finishes each part of a frame, and the
+time since the previous mark is added to that phase. Finished frames go
+into a fixed-size ring buffer. The buffer can be drawn as a frame-time
+graph or exported as CSV, JSON or a Chrome trace (chrome://tracing or
+https://ui.perfetto.dev).
+"""
+import csv
+import json
+import time
+from array import array
+
+import pygame
+
+# Phases of a frame, in the order they usually happen
+PHASES = ('events', 'movement', 'food_spawn', 'background', 'draw_snake',
+          'draw_food', 'hud', 'overlay', 'update', 'capture', 'wait')
+PHASE_INDEX = {phase: index for index, phase in enumerate(PHASES)}
+
+PROFILE_FRAMES = 600  # Frames kept in the ring buffer, 10 seconds at 60 FPS
+GRAPH_MAX_MS = 40  # Busy time shown at the top of the graph
+GRAPH_OK = (0, 200, 0)
+GRAPH_SLOW = (255, 60, 60)
+GRAPH_GUIDE = (90, 90, 90)
+
+
+class FrameProfiler:
+    """Ring buffer of per-phase frame timings."""
+
+    def __init__(self, frames=PROFILE_FRAMES, budget_ms=1000 / 60):
+        self.frames = frames
+        self.budget_ms = budget_ms  # frames busier than this are drawn red
+        self.durations = array('d', bytes(8 * frames * len(PHASES)))  # seconds, frame-major
+        self.starts = array('d', bytes(8 * frames))  # perf_counter() at the start of each frame
+        self.current = array('d', bytes(8 * len(PHASES)))
+        self.next_slot = 0
+        self.count = 0
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def begin_frame(self):
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """Add the time since the previous mark to phase."""
+        now = time.perf_counter()
+        self.current[PHASE_INDEX[phase]] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        """Store the frame in the ring buffer, overwriting the oldest one when full."""
+        slot = self.next_slot
+        base = slot * len(PHASES)
+        self.durations[base:base + len(PHASES)] = self.current
+        self.starts[slot] = self.frame_start
+        self.current = array('d', bytes(8 * len(PHASES)))
+        self.next_slot = (slot + 1) % self.frames
+        self.count = min(self.count + 1, self.frames)
+
+    def recorded(self):
+        """Yield (start, durations) for the buffered frames, oldest first."""
+        first = (self.next_slot - self.count) % self.frames
+        for offset in range(self.count):
+            slot = (first + offset) % self.frames
+            base = slot * len(PHASES)
+            yield self.starts[slot], self.durations[base:base + len(PHASES)]
+
+    def busy_ms(self, durations):
+        """Time a frame spent working, i.e. not waiting for the clock, in milliseconds."""
+        return (sum(durations) - durations[PHASE_INDEX['wait']]) * 1000
+
+    def average_busy_ms(self, frames=60):
+        """Average busy time of the most recent frames."""
+        recent = list(self.recorded())[-frames:]
+        if not recent:
+            return 0.0
+        return sum(self.busy_ms(durations) for start, durations in recent) / len(recent)
+
+    def draw_graph(self, surface, rect):
+        """Draw the busy time of the most recent frames, one pixel column per frame."""
+        surface.fill((0, 0, 0), rect)
+        budget_y = rect.bottom - 1 - int(self.budget_ms / GRAPH_MAX_MS * (rect.height - 1))
+        pygame.draw.line(surface, GRAPH_GUIDE, (rect.left, budget_y), (rect.right - 1, budget_y))
+
+        recent = list(self.recorded())[-rect.width:]
+        x = rect.right - len(recent)
+        for start, durations in recent:
+            busy = self.busy_ms(durations)
+            height = max(1, min(rect.height, int(busy / GRAPH_MAX_MS * rect.height)))
+            color = GRAPH_OK if busy <= self.budget_ms else GRAPH_SLOW
+            pygame.draw.line(surface, color, (x, rect.bottom - 1), (x, rect.bottom - height))
+            x += 1
+
+    def export(self, path):
+        """Write the buffer to path; the format follows the extension:
+        .csv, .trace.json (Chrome trace) or .json."""
+        if path.endswith('.csv'):
+            self.export_csv(path)
+        elif path.endswith('.trace.json'):
+            self.export_chrome_trace(path)
+        else:
+            self.export_json(path)
+
+    def export_csv(self, path):
+        """One row per frame, phase times in milliseconds."""
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['start_s'] + [f'{phase}_ms' for phase in PHASES])
+            for start, durations in self.recorded():
+                writer.writerow([f'{start:.6f}'] + [f'{duration * 1000:.4f}' for duration in durations])
+
+    def export_json(self, path):
+        """A list of frames with their start time and phase times in milliseconds."""
+        frames = [{'start_s': start,
+                   'phases_ms': {phase: duration * 1000 for phase, duration in zip(PHASES, durations)}}
+                  for start, durations in self.recorded()]
+        with open(path, 'w') as json_file:
+            json.dump({'phases': PHASES, 'frames': frames}, json_file)
+
+    def export_chrome_trace(self, path):
+        """Chrome trace events; a frame's phases are laid out one after another in PHASES order."""
+        events = []
+        for frame, (start, durations) in enumerate(self.recorded()):
+            timestamp = start * 1e6
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': timestamp,
+                           'dur': sum(durations) * 1e6, 'args': {'frame': frame}})
+            for phase, duration in zip(PHASES, durations):
+                if duration:
+                    events.append({'name': phase, 'ph': 'X', 'pid': 1, 'tid': 1,
+                                   'ts': timestamp, 'dur': duration * 1e6})
+                    timestamp += duration * 1e6
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
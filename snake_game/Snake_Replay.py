@@ -0,0 +1,171 @@
+"""Deterministic recording and playback of Snake games.
+
+A game is fully determined by the board, the seed of the engine's random
+generator and the turns passed to SnakeEngine.step(), so that is all a
+replay stores. The file is a fixed header followed by one varint per
+turn, holding the ticks since the previous turn and a 2-bit direction.
+
+Run `python Snake_Replay.py FILE` to play a replay back as fast as the
+CPU allows, or watch it with `python Snake_Pro.py --replay FILE`.
+"""
+import argparse
+import struct
+import time
+from bisect import bisect_right
+
+from Snake_Engine import DIRECTION_CODES, DIRECTIONS, SnakeEngine
+
+MAGIC = b'SNKR'
+VERSION = 1
+
+# magic, version, cols, rows, start column, start row, seed, ticks, number of turns
+HEADER = struct.Struct('<4sBHHHHQII')
+
+CHECKPOINT_INTERVAL = 500  # Ticks between the snapshots used for seeking
+
+
+class Replay:
+    """The seed, board and turns of one game."""
+
+    def __init__(self, cols, rows, start, seed, events=None, ticks=0):
+        self.cols = cols
+        self.rows = rows
+        self.start = tuple(start)
+        self.seed = seed
+        self.events = events if events is not None else []  # (tick, direction), in order
+        self.ticks = ticks  # length of the game in ticks
+
+    @classmethod
+    def for_engine(cls, engine, seed):
+        """Start an empty replay of a game that engine.reset(seed) is about to begin."""
+        return cls(engine.cols, engine.rows, engine.start, seed)
+
+    def record(self, tick, direction):
+        """Remember that direction was passed to the step() that produced this tick."""
+        self.events.append((tick, direction))
+
+    def turns(self):
+        """Return the turns as a dict of tick -> direction."""
+        return dict(self.events)
+
+    def to_bytes(self):
+        """Encode the replay in the compact binary format."""
+        data = bytearray(HEADER.pack(MAGIC, VERSION, self.cols, self.rows, self.start[0],
+                                     self.start[1], self.seed, self.ticks, len(self.events)))
+        last_tick = 0
+        for tick, direction in self.events:
+            value = (tick - last_tick) << 2 | DIRECTION_CODES[direction]
+            last_tick = tick
+            # Unsigned LEB128: 7 bits per byte, high bit set on all but the last byte
+            while value >= 0x80:
+                data.append(value & 0x7F | 0x80)
+                value >>= 7
+            data.append(value)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Decode a replay written by to_bytes()."""
+        magic, version, cols, rows, start_x, start_y, seed, ticks, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a Snake replay')
+
+        events = []
+        offset = HEADER.size
+        tick = 0
+        for _ in range(count):
+            value = shift = 0
+            while True:
+                byte = data[offset]
+                offset += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            tick += value >> 2
+            events.append((tick, DIRECTIONS[value & 3]))
+        return cls(cols, rows, (start_x, start_y), seed, events, ticks)
+
+    def save(self, path):
+        with open(path, 'wb') as replay_file:
+            replay_file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as replay_file:
+            return cls.from_bytes(replay_file.read())
+
+
+class ReplayPlayer:
+    """Feeds a replay back through a headless SnakeEngine.
+
+    A snapshot of the engine is kept every checkpoint_interval ticks, so
+    seek() only has to simulate from the nearest checkpoint.
+    """
+
+    def __init__(self, replay, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.replay = replay
+        self.checkpoint_interval = checkpoint_interval
+        self.engine = SnakeEngine(replay.cols, replay.rows, start=replay.start)
+        self.engine.reset(replay.seed)
+        self.event_ticks = [tick for tick, direction in replay.events]
+        self.next_event = 0
+        self.checkpoints = {0: (self.engine.snapshot(), 0)}
+
+    @property
+    def finished(self):
+        return self.engine.done or self.engine.ticks >= self.replay.ticks
+
+    def step(self):
+        """Play one tick and return what SnakeEngine.step() returned."""
+        engine = self.engine
+        turn = None
+        if self.next_event < len(self.event_ticks) and self.event_ticks[self.next_event] == engine.ticks + 1:
+            turn = self.replay.events[self.next_event][1]
+            self.next_event += 1
+        result = engine.step(turn)
+        if engine.ticks % self.checkpoint_interval == 0 and engine.ticks not in self.checkpoints:
+            self.checkpoints[engine.ticks] = (engine.snapshot(), self.next_event)
+        return result
+
+    def run(self, realtime=False):
+        """Play to the end, pacing ticks like the game does if realtime is set."""
+        while not self.finished:
+            self.step()
+            if realtime:
+                time.sleep(1 / self.engine.speed)
+        return self.engine
+
+    def seek(self, tick):
+        """Jump to the state right after the given tick."""
+        tick = min(tick, self.replay.ticks)
+        known = sorted(self.checkpoints)
+        start = known[bisect_right(known, tick) - 1]
+        if not (start <= self.engine.ticks <= tick):
+            snapshot, self.next_event = self.checkpoints[start]
+            self.engine.restore(snapshot)
+        while self.engine.ticks < tick and not self.engine.done:
+            self.step()
+        return self.engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play back a Snake replay without a window.')
+    parser.add_argument('replay', help='replay file written by Snake_Pro.py --record')
+    parser.add_argument('--seek', type=int, metavar='TICK', help='stop after this tick')
+    parser.add_argument('--realtime', action='store_true', help='play at the game speed')
+    args = parser.parse_args()
+
+    player = ReplayPlayer(Replay.load(args.replay))
+    start = time.perf_counter()
+    if args.seek is not None:
+        engine = player.seek(args.seek)
+    else:
+        engine = player.run(realtime=args.realtime)
+    elapsed = time.perf_counter() - start
+    print(f'tick {engine.ticks}/{player.replay.ticks}  score {engine.score}  '
+          f'length {len(engine.snake_body)}  done {engine.done}  ({elapsed:.3f}s)')
+
+
+if __name__ == '__main__':
+    main()
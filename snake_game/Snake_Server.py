@@ -0,0 +1,352 @@
+"""Authoritative multiplayer Snake server on asyncio, and clients for it.
+
+The server runs a MultiSnakeEngine at a fixed tick rate and hosts one
+snake per TCP connection. Messages are JSON, one per line. Clients send
+turns:
+
+    {"turn": "UP"}
+
+The server starts each client off with a welcome and a keyframe of the
+whole board, then broadcasts only the changes of every tick: new heads,
+whether tails followed, deaths, spawns and food moves. A tick's message
+is encoded once for all clients and its size depends on the number of
+snakes, not on their length. A client whose socket falls behind skips
+ticks and gets a fresh keyframe once it has caught up.
+
+Run a server with `python Snake_Server.py`, join it with
+`python Snake_Pro.py --connect HOST:PORT`, or try everything on loopback
+with simulated players:
+
+    python Snake_Server.py --simulate 8 --ticks 500
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import queue
+import socket
+import threading
+import time
+
+from Snake_Engine import MOVES, OPPOSITE, board_size
+from Snake_Multi import MultiSnakeEngine, WorldView
+
+HOST = '127.0.0.1'
+PORT = 8765
+BOARD = (29, 19)  # The play area of Snake_Pro.py, so its window can show the whole board
+TICK_RATE = 10  # Ticks per second
+RESPAWN_TICKS = 20  # Ticks a crashed player waits before getting a new snake
+MAX_WRITE_BUFFER = 64 * 1024  # Bytes queued for a client before it starts skipping ticks
+MAX_SNAKE_ID = 65535  # MultiSnakeEngine.grid stores snake ids in 16 bits
+
+
+def encode(message):
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+class ClientConnection:
+    """The server's side of one player."""
+
+    def __init__(self, snake_id, writer):
+        self.snake_id = snake_id
+        self.writer = writer
+        self.task = asyncio.current_task()
+        self.needs_keyframe = True
+        self.respawn_tick = None
+        self.bytes_sent = 0
+        self.skipped_ticks = 0
+
+    def send(self, data):
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+    @property
+    def behind(self):
+        return self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER
+
+
+class SnakeServer:
+    """Hosts one MultiSnakeEngine game for every client that connects."""
+
+    def __init__(self, cols=BOARD[0], rows=BOARD[1], tick_rate=TICK_RATE, seed=None):
+        self.engine = MultiSnakeEngine(cols, rows, seed)
+        self.tick_rate = tick_rate
+        self.clients = {}  # snake id -> ClientConnection
+        self.next_id = 1
+        self.free_ids = []  # Heap of the ids of players that left, handed out again first
+        self.server = None
+        self.port = None
+        self.tick_seconds = 0.0  # Time spent in tick(), summed over all ticks
+
+    async def start(self, host=HOST, port=PORT):
+        """Start listening; port 0 picks a free port, stored in self.port."""
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def run(self, ticks=None):
+        """Tick at the fixed rate, forever or for the given number of ticks."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while ticks is None or self.engine.ticks < ticks:
+            next_tick += 1 / self.tick_rate
+            self.tick()
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    async def close(self):
+        """Stop listening, disconnect every client and wait for their handlers to finish."""
+        self.server.close()
+        tasks = [client.task for client in self.clients.values()]
+        for client in self.clients.values():
+            client.writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def welcome(self, client):
+        engine = self.engine
+        return encode({'type': 'welcome', 'id': client.snake_id, 'cols': engine.cols,
+                       'rows': engine.rows, 'tick_rate': self.tick_rate})
+
+    def take_id(self):
+        """Return the lowest snake id not in use, or None if every id is taken."""
+        if self.free_ids:
+            return heapq.heappop(self.free_ids)
+        if self.next_id > MAX_SNAKE_ID:
+            return None
+        self.next_id += 1
+        return self.next_id - 1
+
+    async def handle_client(self, reader, writer):
+        snake_id = self.take_id()
+        if snake_id is None:
+            writer.close()  # Server full
+            return
+        client = ClientConnection(snake_id, writer)
+        self.clients[snake_id] = client
+        client.send(self.welcome(client))
+        if self.engine.add_snake(snake_id) is None:
+            client.respawn_tick = self.engine.ticks + 1  # No room yet, keep trying
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    self.engine.turn(snake_id, json.loads(line)['turn'])
+                except (ValueError, KeyError, TypeError):
+                    pass  # Ignore anything that is not a turn
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(snake_id, None)
+            self.engine.remove_snake(snake_id)
+            # Clients apply the removal before any spawn of the same tick, so the id can go straight back
+            heapq.heappush(self.free_ids, snake_id)
+            writer.close()
+
+    def tick(self):
+        """Advance the game and send the changes to every client."""
+        start = time.perf_counter()
+        engine = self.engine
+
+        # Players whose snake crashed get a new one after a while
+        for snake_id, client in self.clients.items():
+            if client.respawn_tick is not None and engine.ticks >= client.respawn_tick:
+                if engine.add_snake(snake_id) is not None:
+                    client.respawn_tick = None
+                else:
+                    client.respawn_tick = engine.ticks + 1
+
+        changes = engine.step()
+        for snake_id in changes['died']:
+            if snake_id in self.clients:
+                self.clients[snake_id].respawn_tick = engine.ticks + RESPAWN_TICKS
+
+        changes['type'] = 'delta'
+        data = encode(changes)
+        keyframe = None
+        for client in self.clients.values():
+            if client.behind:
+                # Don't pile up data for a slow client; it gets a keyframe once it has caught up
+                client.needs_keyframe = True
+                client.skipped_ticks += 1
+            elif client.needs_keyframe:
+                if keyframe is None:
+                    keyframe = encode(dict(engine.keyframe(), type='keyframe'))
+                client.send(keyframe)
+                client.needs_keyframe = False
+            else:
+                client.send(data)
+        self.tick_seconds += time.perf_counter() - start
+
+
+def greedy_turn(view, snake_id):
+    """A simple player for simulated clients: the free neighbour closest to any food."""
+    cells = view.snakes.get(snake_id)
+    if not cells:
+        return None
+    cols, rows = view.cols, view.rows
+    direction = view.directions[snake_id]
+    x, y = cells[0] % cols, cells[0] // cols
+    best = None
+    for turn, (dx, dy) in MOVES.items():
+        nx, ny = x + dx, y + dy
+        if turn == OPPOSITE[direction] or not (0 <= nx < cols and 0 <= ny < rows):
+            continue
+        if view.occupied[ny * cols + nx]:
+            continue
+        distance = min((abs(nx - food % cols) + abs(ny - food // cols) for food in view.food), default=0)
+        if best is None or distance < best[0]:
+            best = (distance, turn)
+    return best[1] if best and best[1] != direction else None
+
+
+class SimulatedClient:
+    """A player on an asyncio connection that mirrors the board and steers greedily."""
+
+    def __init__(self):
+        self.view = None
+        self.snake_id = None
+        self.bytes_received = 0
+        self.messages = 0
+
+    async def run(self, host, port, stop):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while not stop.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                self.bytes_received += len(line)
+                self.messages += 1
+                message = json.loads(line)
+                if message['type'] == 'welcome':
+                    self.snake_id = message['id']
+                    self.view = WorldView(message['cols'], message['rows'])
+                elif message['type'] == 'keyframe':
+                    self.view.load_keyframe(message)
+                else:
+                    self.view.apply(message)
+                    turn = greedy_turn(self.view, self.snake_id)
+                    if turn is not None:
+                        writer.write(encode({'turn': turn}))
+        finally:
+            writer.close()
+
+
+class Connection:
+    """A blocking client connection for the pygame UI.
+
+    A reader thread keeps the WorldView up to date; poll() applies what
+    arrived on the caller's thread, so drawing never waits on the network.
+    """
+
+    def __init__(self, host, port):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.messages = queue.SimpleQueue()
+        self.closed = False
+        self.file = self.socket.makefile('rb')
+        welcome = json.loads(self.file.readline())
+        self.snake_id = welcome['id']
+        self.tick_rate = welcome['tick_rate']
+        self.view = WorldView(welcome['cols'], welcome['rows'])
+        threading.Thread(target=self.read_messages, daemon=True).start()
+
+    def read_messages(self):
+        try:
+            for line in self.file:
+                self.messages.put(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        self.messages.put(None)
+
+    def poll(self):
+        """Apply every message received so far; returns False once the server is gone."""
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                return not self.closed
+            if message is None:
+                self.closed = True
+            elif message['type'] == 'keyframe':
+                self.view.load_keyframe(message)
+            else:
+                self.view.apply(message)
+
+    def send_turn(self, direction):
+        try:
+            self.socket.sendall(encode({'turn': direction}))
+        except OSError:
+            self.closed = True
+
+    def close(self):
+        self.socket.close()
+
+
+async def simulate(players, ticks, tick_rate, board, seed):
+    """Run a server and simulated players on loopback, then check every mirror
+    against the server's board and report bandwidth and tick cost."""
+    server = SnakeServer(*board, tick_rate=tick_rate, seed=seed)
+    await server.start(HOST, 0)
+    stop = asyncio.Event()
+    clients = [SimulatedClient() for _ in range(players)]
+    tasks = [asyncio.create_task(client.run(HOST, server.port, stop)) for client in clients]
+    await server.run(ticks)
+
+    # Let the last tick arrive, then compare what the clients see with the truth
+    await asyncio.sleep(0.2)
+    engine = server.engine
+    truth = {snake.id: list(snake.cells) for snake in engine.snakes.values()}
+    mismatches = 0
+    for client in clients:
+        view = client.view
+        if ({snake_id: list(cells) for snake_id, cells in view.snakes.items()} != truth
+                or view.food != engine.food or view.tick != engine.ticks):
+            mismatches += 1
+
+    stop.set()
+    await server.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    lengths = [len(cells) for cells in truth.values()]
+    print(f'{players} players, {ticks} ticks at {tick_rate}/s on {board[0]}x{board[1]}')
+    print(f'server: {server.tick_seconds / max(ticks, 1) * 1e6:.0f} us per tick')
+    print(f'clients: {sum(client.bytes_received for client in clients) / players / max(ticks, 1):.0f} '
+          f'bytes per tick each, longest snake {max(lengths, default=0)}')
+    print(f'mirrors matching the server: {players - mismatches}/{players}')
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multiplayer Snake server.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--board', type=board_size, default=BOARD, metavar='COLSxROWS')
+    parser.add_argument('--tick-rate', type=float, default=TICK_RATE)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--simulate', type=int, metavar='PLAYERS',
+                        help='run on loopback with this many simulated players instead of serving')
+    parser.add_argument('--ticks', type=int, default=300, help='length of a --simulate run')
+    args = parser.parse_args()
+
+    if args.simulate:
+        mismatches = asyncio.run(simulate(args.simulate, args.ticks, args.tick_rate, args.board, args.seed))
+        raise SystemExit(1 if mismatches else 0)
+
+    async def serve():
+        server = SnakeServer(*args.board, tick_rate=args.tick_rate, seed=args.seed)
+        await server.start(args.host, args.port)
+        print(f'Snake server on {args.host}:{server.port}')
+        await server.run()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Cache of rendered text surfaces shared by Snake.py and Snake_Pro.py.
+
+Rasterizing a string with Font.render is slow compared to blitting the
+result, and the game draws the same few strings over and over.
+"""
+from collections import OrderedDict
+
+TEXT_CACHE_SIZE = 64  # Number of rendered strings kept around
+
+
+class TextCache:
+    """Bounded least-recently-used cache of rendered text surfaces.
+
+    Surfaces are keyed by (font, text, color, antialias), so the same
+    string in another font or color is rendered separately.
+    """
+
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        """Return font.render(text, antialias, color), rendering it only once."""
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, antialias, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)  # Drop the least recently used string
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def clear(self):
+        """Forget every rendered string, e.g. after the fonts change."""
+        self.surfaces.clear()
@@ -0,0 +1,244 @@
+"""Run many headless Snake games in parallel and report on them.
+
+Each game gets its own seed and an input policy: the autopilot or one of
+a few scripted players. Games are spread over a pool of worker processes
+and every result is streamed to a JSON lines file as soon as its game
+ends, so long soak runs can be watched and interrupted without losing
+what already finished. The report at the end aggregates the results by
+policy:
+
+    python Snake_Tournament.py --games 2000 --policy autopilot greedy --out results.jsonl
+
+Results include the cause of death as seen by SnakeEngine.check_collision()
+and the game time spent at each speed, for tuning the speed curve.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+from Snake_Autopilot import Autopilot
+from Snake_Engine import MOVES, OPPOSITE, SnakeEngine, board_size
+
+DEFAULT_BOARD = (29, 19)  # The play area of Snake_Pro.py
+MAX_TICKS = 100000  # Games still going after this many ticks are stopped
+RANDOM_TURN_CHANCE = 0.2  # How often the random policy tries a new direction
+
+
+def positive_int(text):
+    """Parse a count of at least 1 on the command line."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected a whole number, got {text!r}')
+    if value < 1:
+        raise argparse.ArgumentTypeError('must be at least 1')
+    return value
+
+
+def safe_moves(engine):
+    """Directions that do not run into a wall or the snake on the next tick."""
+    x, y = engine.snake_pos
+    return [direction for direction, (dx, dy) in MOVES.items()
+            if direction != OPPOSITE[engine.direction] and not engine.check_collision((x + dx, y + dy))]
+
+
+def straight_policy(engine, rng):
+    """Never turn; a baseline for how long a game lasts without input."""
+    return lambda: None
+
+
+def random_policy(engine, rng):
+    """Keep going straight, sometimes turning to a random safe direction."""
+    def choose():
+        moves = safe_moves(engine)
+        if moves and (engine.direction not in moves or rng.random() < RANDOM_TURN_CHANCE):
+            return rng.choice(moves)
+        return None
+    return choose
+
+
+def greedy_policy(engine, rng):
+    """Take the safe move that gets closest to the food, like a hurried player."""
+    def choose():
+        moves = safe_moves(engine)
+        if not moves:
+            return None
+        x, y = engine.snake_pos
+        food_x, food_y = engine.food_pos
+
+        def distance(direction):
+            dx, dy = MOVES[direction]
+            return abs(x + dx - food_x) + abs(y + dy - food_y), rng.random()
+
+        return min(moves, key=distance)
+    return choose
+
+
+def autopilot_policy(engine, rng):
+    autopilot = _autopilots.get(id(engine))
+    if autopilot is None:
+        autopilot = _autopilots[id(engine)] = Autopilot(engine)
+    autopilot.reset()
+    return autopilot.choose
+
+
+# Policy name -> factory(engine, rng) returning a function that picks each tick's turn
+POLICIES = {
+    'autopilot': autopilot_policy,
+    'greedy': greedy_policy,
+    'random': random_policy,
+    'straight': straight_policy,
+}
+
+# Engines and autopilots are reused between the games a worker plays on the same board
+_engines = {}
+_autopilots = {}
+
+
+def death_cause(engine):
+    """Why a finished game ended: 'won', 'wall', 'self', or 'timeout' if it did not end."""
+    if engine.won:
+        return 'won'
+    if not engine.done:
+        return 'timeout'
+    # A collision stops the head before it moves, so check the cell it tried to enter
+    dx, dy = MOVES[engine.direction]
+    return engine.check_collision((engine.snake_pos[0] + dx, engine.snake_pos[1] + dy))
+
+
+def run_game(spec):
+    """Play one game described by (policy, cols, rows, seed, max_ticks); returns its result."""
+    policy, cols, rows, seed, max_ticks = spec
+    engine = _engines.get((cols, rows))
+    if engine is None:
+        engine = _engines[(cols, rows)] = SnakeEngine(cols, rows)
+    engine.reset(seed)
+    choose = POLICIES[policy](engine, random.Random(f'{policy}-{seed}'))
+
+    # Game seconds spent at each speed, as game_loop would play it
+    speed_seconds = Counter()
+    start = time.perf_counter()
+    while not engine.done and engine.ticks < max_ticks:
+        speed_seconds[engine.speed] += 1 / engine.speed
+        engine.step(choose())
+    elapsed = time.perf_counter() - start
+
+    return {
+        'policy': policy,
+        'board': [cols, rows],
+        'seed': seed,
+        'score': engine.score,
+        'length': len(engine.snake_body),
+        'ticks': engine.ticks,
+        'tick_us': elapsed / max(engine.ticks, 1) * 1e6,
+        'cause': death_cause(engine),
+        'speed': engine.speed,
+        'game_seconds': sum(speed_seconds.values()),
+        'speed_seconds': {str(speed): seconds for speed, seconds in sorted(speed_seconds.items())},
+        'worker': os.getpid(),
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(results):
+    """Aggregate results by policy; returns policy -> statistics."""
+    by_policy = {}
+    for result in results:
+        by_policy.setdefault(result['policy'], []).append(result)
+
+    report = {}
+    for policy, games in by_policy.items():
+        scores = [game['score'] for game in games]
+        speed_seconds = Counter()
+        for game in games:
+            speed_seconds.update({int(speed): seconds for speed, seconds in game['speed_seconds'].items()})
+        total_seconds = sum(speed_seconds.values()) or 1
+        report[policy] = {
+            'games': len(games),
+            'score_mean': statistics.fmean(scores),
+            'score_median': statistics.median(scores),
+            'score_p90': percentile(scores, 0.9),
+            'score_max': max(scores),
+            'ticks_mean': statistics.fmean(game['ticks'] for game in games),
+            'tick_us_mean': statistics.fmean(game['tick_us'] for game in games),
+            'game_seconds_mean': statistics.fmean(game['game_seconds'] for game in games),
+            'causes': dict(Counter(game['cause'] for game in games)),
+            'speed_share': {speed: seconds / total_seconds for speed, seconds in sorted(speed_seconds.items())},
+        }
+    return report
+
+
+def print_report(report):
+    print(f'{"policy":<12}{"games":>7}{"mean":>9}{"median":>8}{"p90":>7}{"max":>7}'
+          f'{"ticks":>10}{"us/tick":>9}{"game s":>9}  causes')
+    for policy, stats in report.items():
+        causes = ' '.join(f'{cause} {count}' for cause, count in sorted(stats['causes'].items()))
+        print(f'{policy:<12}{stats["games"]:>7}{stats["score_mean"]:>9.1f}{stats["score_median"]:>8g}'
+              f'{stats["score_p90"]:>7}{stats["score_max"]:>7}{stats["ticks_mean"]:>10.0f}'
+              f'{stats["tick_us_mean"]:>9.1f}{stats["game_seconds_mean"]:>9.1f}  {causes}')
+        share = ' '.join(f'{speed}:{fraction:.0%}' for speed, fraction in stats['speed_share'].items())
+        print(f'{"":<12}time at speed  {share}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play many headless Snake games in parallel.')
+    parser.add_argument('--games', type=int, default=1000, help='games per policy')
+    parser.add_argument('--policy', nargs='+', choices=sorted(POLICIES), default=['autopilot'])
+    parser.add_argument('--board', type=board_size, default=DEFAULT_BOARD, metavar='COLSxROWS')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    parser.add_argument('--workers', type=positive_int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--out', metavar='FILE', help='stream every result to FILE as JSON lines')
+    parser.add_argument('--report', metavar='FILE', help='write the aggregated report as JSON')
+    args = parser.parse_args()
+
+    cols, rows = args.board
+    specs = [(policy, cols, rows, args.seed + game, args.max_ticks)
+             for game in range(args.games) for policy in args.policy]
+    # Big enough chunks to keep the inter-process traffic low, small enough to stream
+    chunksize = max(1, min(32, len(specs) // (args.workers * 8)))
+
+    results = []
+    out_file = open(args.out, 'w') if args.out else None
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            for result in pool.imap_unordered(run_game, specs, chunksize):
+                results.append(result)
+                if out_file:
+                    out_file.write(json.dumps(result) + '\n')
+                    out_file.flush()
+                if len(results) % 100 == 0 or len(results) == len(specs):
+                    print(f'\r{len(results)}/{len(specs)} games', end='', file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        print('\ninterrupted, reporting the finished games', file=sys.stderr)
+    finally:
+        if out_file:
+            out_file.close()
+    elapsed = time.perf_counter() - start
+    total_ticks = sum(result['ticks'] for result in results)
+    print(f'\n{len(results)} games, {total_ticks} ticks in {elapsed:.1f}s '
+          f'({total_ticks / max(elapsed, 1e-9):.0f} ticks/s)', file=sys.stderr)
+
+    if not results:
+        return
+    report = summarize(results)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump({'board': [cols, rows], 'max_ticks': args.max_ticks, 'policies': report},
+                      report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
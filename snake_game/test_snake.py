@@ -0,0 +1,140 @@
+"""Checks that the headless engines, replays and snapshots agree with each other.
+
+Run with `python -m pytest` from this directory.
+"""
+import random
+
+import pytest
+
+from Snake_Engine import DIRECTIONS, MOVES, OPPOSITE, SnakeEngine
+from Snake_Replay import Replay, ReplayPlayer
+
+COLS, ROWS = 12, 9
+WANDER_CHANCE = 0.2  # How often the random player picks any safe move instead of heading for the food
+MISTAKE_CHANCE = 0.01  # How often it turns without looking, so games end
+
+
+def random_turns(engine, seed):
+    """An endless stream of turns for engine's game from a seeded player that
+    mostly heads for the food and avoids walls and its body."""
+    rng = random.Random(seed)
+    while True:
+        if rng.random() < MISTAKE_CHANCE:
+            yield rng.choice(DIRECTIONS)
+            continue
+        x, y = engine.snake_pos
+        food_x, food_y = engine.food_pos or (x, y)
+        safe = [direction for direction, (dx, dy) in MOVES.items()
+                if direction != OPPOSITE[engine.direction] and not engine.check_collision((x + dx, y + dy))]
+        if not safe:
+            yield None
+            continue
+        if rng.random() < WANDER_CHANCE:
+            turn = rng.choice(safe)
+        else:
+            turn = min(safe, key=lambda direction: abs(x + MOVES[direction][0] - food_x) +
+                       abs(y + MOVES[direction][1] - food_y))
+        yield None if turn == engine.direction else turn
+
+
+def engine_state(engine):
+    return (engine.snake_pos, engine.direction, engine.food_pos, engine.score, engine.speed,
+            engine.ticks, engine.done, engine.won, list(engine.snake_body))
+
+
+def play(engine, turns, ticks):
+    """Step until the game ends or the given tick; returns the state after every tick."""
+    states = []
+    while not engine.done and engine.ticks < ticks:
+        engine.step(next(turns))
+        states.append(engine_state(engine))
+    return states
+
+
+def test_batch_matches_engine():
+    pytest.importorskip('numpy')
+    from Snake_Batch import DIRECTION_CODES, KEEP_GOING, BatchSnakeEngine
+
+    n = 16
+    batch = BatchSnakeEngine(n, COLS, ROWS, seed=1)
+    engines = [SnakeEngine(COLS, ROWS, start=batch.start, seed=board) for board in range(n)]
+    # The engines place their food where the batch placed its own, so the games stay the same
+    for board, engine in enumerate(engines):
+        engine.generate_food_position = lambda snake_body, board=board: pending_food[board]
+    pending_food = [divmod(int(cell), COLS)[::-1] if cell >= 0 else None for cell in batch.food]
+    for engine in engines:
+        engine.reset()
+
+    players = [random_turns(engine, board) for board, engine in enumerate(engines)]
+    games = 0
+    for _ in range(2000):
+        actions = [next(player) for player in players]
+        state, rewards, dones = batch.step([KEEP_GOING if turn is None else DIRECTION_CODES[turn]
+                                            for turn in actions])
+        pending_food = [divmod(int(cell), COLS)[::-1] if cell >= 0 else None for cell in batch.food]
+        for board, (engine, turn) in enumerate(zip(engines, actions)):
+            _, reward, done = engine.step(turn)
+            assert (reward, done) == (rewards[board], dones[board])
+            if done:
+                games += 1
+                assert engine.score == batch.final_score[board]
+                engine.reset()
+            body = [cell[1] * COLS + cell[0] for cell in engine.snake_body]
+            assert body == batch.snake_body(board).tolist()
+            assert engine.food_pos == pending_food[board]
+            assert (engine.score, engine.speed) == (batch.score[board], batch.speed[board])
+    assert games > n  # Every board went through a few games
+
+
+def test_snapshot_restore_round_trip():
+    engine = SnakeEngine(COLS, ROWS, seed=3)
+    play(engine, random_turns(engine, 4), 40)
+    snapshot = engine.snapshot()
+    later = play(engine, random_turns(engine, 5), 1000)
+    assert engine.score > 0
+
+    # Playing on from the snapshot, in this engine or a new one, repeats the game exactly
+    for target in (engine, SnakeEngine(COLS, ROWS)):
+        target.restore(snapshot)
+        assert target.snapshot() == snapshot
+        assert play(target, random_turns(target, 5), 1000) == later
+
+    with pytest.raises(ValueError):
+        SnakeEngine(COLS + 1, ROWS).restore(snapshot)
+    with pytest.raises(ValueError):
+        engine.restore(b'\0' * len(snapshot))
+
+
+def record_game(seed):
+    """Play a random game, reusing an engine as SnakeGame does, and return it and its replay."""
+    engine = SnakeEngine(COLS, ROWS)
+    play(engine, random_turns(engine, seed), 100)  # An earlier game on the same engine
+    engine.reset(seed)
+    replay = Replay.for_engine(engine, seed)
+    turns = random_turns(engine, seed + 1)
+    while not engine.done and engine.ticks < 2000:
+        turn = next(turns)
+        if turn is not None:
+            replay.record(engine.ticks + 1, turn)
+        engine.step(turn)
+    replay.ticks = engine.ticks
+    return engine, replay
+
+
+@pytest.mark.parametrize('seed', [5, 6, 7])
+def test_replay_round_trip_and_seek(seed):
+    engine, replay = record_game(seed)
+    loaded = Replay.from_bytes(replay.to_bytes())
+    assert (loaded.cols, loaded.rows, loaded.start, loaded.seed, loaded.ticks, loaded.events) == \
+        (replay.cols, replay.rows, replay.start, replay.seed, replay.ticks, replay.events)
+
+    # Playing it back ends on the same state as the recorded game
+    player = ReplayPlayer(loaded, checkpoint_interval=16)
+    assert engine_state(player.run()) == engine_state(engine)
+
+    # Seeking, forwards and backwards through the checkpoints, matches playing from the start
+    for tick in (replay.ticks // 2, 3, replay.ticks, 17):
+        fresh = ReplayPlayer(loaded)
+        while fresh.engine.ticks < tick and not fresh.finished:
+            fresh.step()
+        assert engine_state(player.seek(tick)) == engine_state(fresh.engine)